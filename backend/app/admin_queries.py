@@ -0,0 +1,92 @@
+# admin_queries.py
+
+# Keyset pagination + streaming helpers for the admin dashboard endpoints.
+# Pages are ordered by (timestamp desc, _id desc) and continued with an opaque `after`
+# cursor, so every page costs the same regardless of how deep into history it is.
+
+import base64
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+MAX_PAGE_SIZE = 1000
+SORT_ORDER = [("timestamp", -1), ("_id", -1)]
+
+# Fields the admin endpoints may project, per collection
+LOG_FIELDS = ["username", "symptoms", "predicted_disease", "status", "timestamp"]
+ORDER_FIELDS = ["username", "order_id", "amount_paid", "status", "timestamp"]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(doc):
+    ts = doc.get("timestamp")
+    payload = {"t": ts.isoformat() if isinstance(ts, datetime) else ts, "id": str(doc["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        ts = payload["t"]
+        try:
+            ts = datetime.fromisoformat(ts)
+        except (TypeError, ValueError):
+            pass
+        return ts, ObjectId(payload["id"])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise InvalidCursor(f"Invalid pagination cursor: {e}")
+
+
+def build_query(filters, after=None):
+    """`filters` maps document fields to required values; None values are ignored."""
+    query = {field: value for field, value in filters.items() if value is not None}
+    if after:
+        ts, oid = decode_cursor(after)
+        query["$or"] = [{"timestamp": {"$lt": ts}}, {"timestamp": ts, "_id": {"$lt": oid}}]
+    return query
+
+
+def build_projection(fields, allowed):
+    """Comma-separated field list -> Mongo projection. _id and timestamp are always kept for the cursor."""
+    if not fields:
+        selected = allowed
+    else:
+        selected = [f.strip() for f in fields.split(",") if f.strip() in allowed]
+    return {**{f: 1 for f in selected}, "timestamp": 1, "_id": 1}, selected
+
+
+def _display_timestamp(value):
+    return value.strftime("%Y-%m-%d %H:%M") if isinstance(value, datetime) else value
+
+
+def fetch_page(collection, query, projection, selected, limit):
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    docs = list(collection.find(query, projection).sort(SORT_ORDER).limit(limit + 1))
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    next_cursor = encode_cursor(docs[-1]) if has_more and docs else None
+    items = []
+    for doc in docs:
+        item = {f: doc[f] for f in selected if f in doc}
+        if "timestamp" in item:
+            item["timestamp"] = _display_timestamp(item["timestamp"])
+        items.append(item)
+    return items, next_cursor
+
+
+def stream_ndjson(collection, query, projection, selected, batch_size=500):
+    """Yields one JSON line per document straight from the cursor, never materialising the result."""
+    cursor = collection.find(query, projection).sort(SORT_ORDER).batch_size(batch_size)
+    try:
+        for doc in cursor:
+            item = {f: doc[f] for f in selected if f in doc}
+            if isinstance(item.get("timestamp"), datetime):
+                item["timestamp"] = item["timestamp"].isoformat()
+            yield json.dumps(item, default=str) + "\n"
+    finally:
+        cursor.close()
@@ -0,0 +1,180 @@
+# analytics.py
+
+# Incremental rollups behind the admin telemetry dashboard.
+# Instead of the dashboard downloading every log and order, small counters are $inc-ed
+# into `analytics_rollups` as records are written:
+#   diagnosis_hour  -> diagnoses / emergencies per predicted_disease per hour
+#   revenue_day     -> paid orders / revenue per day
+#   totals          -> lifetime counters (single document)
+# /admin/stats reads a bounded time window of these, so it costs the same no matter how
+# much history the raw collections hold.
+#
+# Rebuild from the raw collections with:  python analytics.py --backfill
+
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+
+TOTALS_ID = "totals"
+
+
+def _hour(ts):
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def _day(ts):
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class AnalyticsRollups:
+    def __init__(self, collection):
+        self.collection = collection
+
+    # ------------------------------------------
+    # Incremental maintenance
+    # ------------------------------------------
+    def record_diagnoses(self, records):
+        """Folds a batch of diagnostic log documents into the rollups with one bulk_write."""
+        per_hour = defaultdict(lambda: [0, 0])
+        for record in records:
+            ts = record.get("timestamp")
+            if not isinstance(ts, datetime):
+                continue
+            counts = per_hour[(_hour(ts), record.get("predicted_disease", "Unknown"))]
+            counts[0] += 1
+            counts[1] += record.get("status") == "EMERGENCY"
+        if not per_hour:
+            return
+
+        ops = [
+            UpdateOne(
+                {"_id": f"diagnosis_hour|{hour.isoformat()}|{disease}"},
+                {"$inc": {"count": n, "emergencies": e}, "$setOnInsert": {"kind": "diagnosis_hour", "bucket": hour, "disease": disease}},
+                upsert=True,
+            )
+            for (hour, disease), (n, e) in per_hour.items()
+        ]
+        ops.append(UpdateOne(
+            {"_id": TOTALS_ID},
+            {"$inc": {"diagnoses": sum(n for n, _ in per_hour.values()), "emergencies": sum(e for _, e in per_hour.values())}},
+            upsert=True,
+        ))
+        self.collection.bulk_write(ops, ordered=False)
+
+    def record_order(self, order):
+        ts = order.get("timestamp")
+        if not isinstance(ts, datetime):
+            return
+        amount = order.get("amount_paid", 0) or 0
+        day = _day(ts)
+        self.collection.bulk_write([
+            UpdateOne(
+                {"_id": f"revenue_day|{day.isoformat()}"},
+                {"$inc": {"orders": 1, "revenue": amount}, "$setOnInsert": {"kind": "revenue_day", "bucket": day}},
+                upsert=True,
+            ),
+            UpdateOne({"_id": TOTALS_ID}, {"$inc": {"orders": 1, "revenue": amount}}, upsert=True),
+        ], ordered=False)
+
+    # ------------------------------------------
+    # Read side
+    # ------------------------------------------
+    def stats(self, hours=24, days=30):
+        now = datetime.now()
+        totals = self.collection.find_one({"_id": TOTALS_ID}) or {}
+
+        by_disease = defaultdict(int)
+        by_hour = defaultdict(lambda: {"diagnoses": 0, "emergencies": 0})
+        window_total = window_emergencies = 0
+        for doc in self.collection.find({"kind": "diagnosis_hour", "bucket": {"$gte": _hour(now - timedelta(hours=hours))}}):
+            by_disease[doc["disease"]] += doc.get("count", 0)
+            bucket = by_hour[doc["bucket"].strftime("%Y-%m-%d %H:00")]
+            bucket["diagnoses"] += doc.get("count", 0)
+            bucket["emergencies"] += doc.get("emergencies", 0)
+            window_total += doc.get("count", 0)
+            window_emergencies += doc.get("emergencies", 0)
+
+        revenue_by_day = {
+            doc["bucket"].strftime("%Y-%m-%d"): {"orders": doc.get("orders", 0), "revenue": doc.get("revenue", 0)}
+            for doc in self.collection.find({"kind": "revenue_day", "bucket": {"$gte": _day(now - timedelta(days=days))}})
+        }
+
+        lifetime_diagnoses = totals.get("diagnoses", 0)
+        return {
+            "lifetime": {
+                "diagnoses": lifetime_diagnoses,
+                "emergencies": totals.get("emergencies", 0),
+                "emergency_rate": round(totals.get("emergencies", 0) / lifetime_diagnoses, 4) if lifetime_diagnoses else 0.0,
+                "orders": totals.get("orders", 0),
+                "revenue": totals.get("revenue", 0),
+            },
+            "window_hours": hours,
+            "diagnoses_by_disease": dict(sorted(by_disease.items(), key=lambda x: -x[1])),
+            "diagnoses_by_hour": dict(sorted(by_hour.items())),
+            "emergency_rate": round(window_emergencies / window_total, 4) if window_total else 0.0,
+            "window_days": days,
+            "revenue_by_day": dict(sorted(revenue_by_day.items())),
+        }
+
+    # ------------------------------------------
+    # Backfill
+    # ------------------------------------------
+    def backfill(self, logs_collection, orders_collection):
+        """
+        Rebuilds every rollup from the raw collections with server-side aggregation.
+        Run it while writes are quiet: increments landing mid-rebuild are overwritten.
+        """
+        hourly = logs_collection.aggregate([
+            {"$match": {"timestamp": {"$type": "date"}}},
+            {"$group": {
+                "_id": {"bucket": {"$dateTrunc": {"date": "$timestamp", "unit": "hour"}}, "disease": "$predicted_disease"},
+                "count": {"$sum": 1},
+                "emergencies": {"$sum": {"$cond": [{"$eq": ["$status", "EMERGENCY"]}, 1, 0]}},
+            }},
+        ], allowDiskUse=True)
+        daily = orders_collection.aggregate([
+            {"$match": {"timestamp": {"$type": "date"}}},
+            {"$group": {
+                "_id": {"$dateTrunc": {"date": "$timestamp", "unit": "day"}},
+                "orders": {"$sum": 1},
+                "revenue": {"$sum": {"$ifNull": ["$amount_paid", 0]}},
+            }},
+        ], allowDiskUse=True)
+
+        docs = []
+        totals = {"_id": TOTALS_ID, "diagnoses": 0, "emergencies": 0, "orders": 0, "revenue": 0}
+        for row in hourly:
+            hour, disease = row["_id"]["bucket"], row["_id"].get("disease") or "Unknown"
+            docs.append({"_id": f"diagnosis_hour|{hour.isoformat()}|{disease}", "kind": "diagnosis_hour", "bucket": hour,
+                         "disease": disease, "count": row["count"], "emergencies": row["emergencies"]})
+            totals["diagnoses"] += row["count"]
+            totals["emergencies"] += row["emergencies"]
+        for row in daily:
+            day = row["_id"]
+            docs.append({"_id": f"revenue_day|{day.isoformat()}", "kind": "revenue_day", "bucket": day,
+                         "orders": row["orders"], "revenue": row["revenue"]})
+            totals["orders"] += row["orders"]
+            totals["revenue"] += row["revenue"]
+        docs.append(totals)
+
+        self.collection.delete_many({})
+        self.collection.insert_many(docs, ordered=False)
+        return totals
+
+
+if __name__ == "__main__":
+    if "--backfill" not in sys.argv[1:]:
+        print("Usage: python analytics.py --backfill")
+        sys.exit(1)
+
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+    db = MongoClient(os.getenv("MONGO_URI"))["diagnosis_system"]
+    print("📊 Rebuilding analytics rollups from diagnostic_logs and orders...")
+    totals = AnalyticsRollups(db["analytics_rollups"]).backfill(db["diagnostic_logs"], db["orders"])
+    print(f"✅ Rollups rebuilt: {totals['diagnoses']} diagnoses, {totals['orders']} orders, revenue ₹{totals['revenue']}.")
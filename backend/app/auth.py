@@ -0,0 +1,157 @@
+# auth.py
+
+# Auth work kept off the shared request threadpool.
+# bcrypt is deliberately slow (~100-300ms of CPU per call). /login and /register used to
+# run it inline in sync handlers, i.e. on the same AnyIO threadpool /predict depends on,
+# so a login spike starved diagnoses. Password work now runs on a small dedicated
+# executor with admission control (excess auth requests get 429 instead of queueing
+# forever), and a successful login issues an HMAC-signed session token so later calls
+# are authenticated with one SHA-256 instead of another bcrypt round.
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+
+class AuthOverloaded(Exception):
+    """Raised when more auth jobs are in flight than the executor admits."""
+
+
+class InvalidToken(Exception):
+    pass
+
+
+# ==========================================
+# PASSWORD HASHING EXECUTOR
+# ==========================================
+class AuthExecutor:
+    def __init__(self, max_workers=2, max_pending=32, bcrypt_rounds=12):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.bcrypt_rounds = bcrypt_rounds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="auth")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_workers=int(os.getenv("AUTH_WORKERS", "2")),
+            max_pending=int(os.getenv("AUTH_MAX_PENDING", "32")),
+            bcrypt_rounds=int(os.getenv("BCRYPT_ROUNDS", "12")),
+        )
+
+    async def run(self, fn, *args):
+        """Runs fn(*args) on the auth executor; raises AuthOverloaded when the queue is full."""
+        with self._lock:
+            if self._in_flight >= self.max_pending:
+                self.rejected += 1
+                raise AuthOverloaded(f"{self._in_flight} auth requests already in flight")
+            self._in_flight += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self.completed += 1
+                self.total_seconds += time.perf_counter() - start
+
+    # Blocking helpers, meant to be called from inside run()
+    def hash_password(self, password):
+        return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=self.bcrypt_rounds)).decode("utf-8")
+
+    @staticmethod
+    def check_password(password, hashed):
+        return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "in_flight": self._in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_ms": round(self.total_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+            }
+
+
+# ==========================================
+# SIGNED SESSION TOKENS
+# ==========================================
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class SessionTokens:
+    """Stateless `<payload>.<signature>` tokens (HMAC-SHA256 over the base64 payload)."""
+
+    def __init__(self, secret, ttl_seconds=12 * 3600):
+        self._key = secret.encode("utf-8") if isinstance(secret, str) else secret
+        self.ttl_seconds = ttl_seconds
+
+    @classmethod
+    def from_env(cls):
+        """
+        Requires SESSION_SECRET: a per-process random key would make tokens fail on every
+        other worker and after every restart. ALLOW_EPHEMERAL_SESSION_SECRET=1 opts into
+        that behaviour for single-process local development only.
+        """
+        secret = os.getenv("SESSION_SECRET")
+        if not secret:
+            if os.getenv("ALLOW_EPHEMERAL_SESSION_SECRET", "0") != "1":
+                raise RuntimeError("SESSION_SECRET is not set; refusing to start "
+                                   "(set ALLOW_EPHEMERAL_SESSION_SECRET=1 for local development).")
+            print("WARN: SESSION_SECRET not set; using a random per-process session key (development only).")
+            secret = secrets.token_hex(32)
+        return cls(secret, ttl_seconds=int(os.getenv("SESSION_TTL_SECONDS", str(12 * 3600))))
+
+    def _sign(self, payload_b64):
+        return _b64encode(hmac.new(self._key, payload_b64.encode("ascii"), hashlib.sha256).digest())
+
+    def issue(self, username):
+        now = int(time.time())
+        payload = json.dumps({"sub": username, "iat": now, "exp": now + self.ttl_seconds}, separators=(",", ":"))
+        payload_b64 = _b64encode(payload.encode("utf-8"))
+        return f"{payload_b64}.{self._sign(payload_b64)}"
+
+    def verify(self, token):
+        """Returns the username the token was issued to; raises InvalidToken otherwise."""
+        try:
+            payload_b64, signature = token.split(".", 1)
+            # Tokens are pure base64url; anything non-ASCII is malformed, not a server error
+            expected = self._sign(payload_b64).encode("ascii")
+            signature = signature.encode("ascii")
+        except (AttributeError, ValueError):
+            raise InvalidToken("Malformed session token")
+        if not hmac.compare_digest(signature, expected):
+            raise InvalidToken("Bad session token signature")
+        try:
+            payload = json.loads(_b64decode(payload_b64))
+        except ValueError:
+            raise InvalidToken("Malformed session token")
+        if not isinstance(payload, dict) or "sub" not in payload:
+            raise InvalidToken("Malformed session token")
+        if payload.get("exp", 0) < time.time():
+            raise InvalidToken("Session expired")
+        return payload["sub"]
@@ -0,0 +1,94 @@
+# catalog_cache.py
+
+# In-process snapshot of the pharmacy catalog for GET /medicines.
+# The catalog only changes when seed_store.py reruns, which bumps a version marker in
+# `store_meta`. Workers check that marker (a single _id lookup) at most every few seconds
+# and only re-read the full catalog when it changes. Each snapshot carries a pre-serialized
+# JSON body, a pre-gzipped copy and an ETag, so a storefront page load costs no Mongo query.
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass
+
+CATALOG_MARKER_ID = "catalog"
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    version: str
+    etag: str
+    body: bytes
+    gzip_body: bytes
+    product_count: int
+
+
+def build_snapshot(version, products):
+    body = json.dumps({"products": products}, default=str, separators=(",", ":")).encode("utf-8")
+    etag = f'W/"{hashlib.sha1(body).hexdigest()[:20]}"'
+    return CatalogSnapshot(version, etag, body, gzip.compress(body, compresslevel=6), len(products))
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison (RFC 7232): W/"x" and "x" match
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return "*" in candidates or any((c[2:] if c.startswith("W/") else c) == bare for c in candidates)
+
+
+class CatalogCache:
+    def __init__(self, inventory_collection, meta_collection, check_interval=5.0, unversioned_ttl=300.0):
+        self.inventory_collection = inventory_collection
+        self.meta_collection = meta_collection
+        self.check_interval = check_interval
+        # Without a marker (catalog seeded by an older script) fall back to a plain TTL
+        self.unversioned_ttl = unversioned_ttl
+        self._snapshot = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def _marker_version(self):
+        marker = self.meta_collection.find_one({"_id": CATALOG_MARKER_ID}, {"version": 1})
+        return str(marker["version"]) if marker and "version" in marker else None
+
+    def current(self):
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._checked_at < self.check_interval:
+            return snapshot
+        if not self._lock.acquire(blocking=snapshot is None):
+            # Another thread is already refreshing; keep serving the current snapshot
+            return snapshot
+        try:
+            if self._snapshot is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return self._snapshot
+            try:
+                version = self._marker_version()
+            except Exception as e:
+                if self._snapshot is None:
+                    raise
+                print(f"WARN: Catalog version check failed, serving cached catalog: {e}")
+                self._checked_at = time.monotonic()
+                return self._snapshot
+
+            stale = (
+                self._snapshot is None
+                or version != self._snapshot.version
+                or (version is None and time.monotonic() - self._loaded_at > self.unversioned_ttl)
+            )
+            if stale:
+                products = list(self.inventory_collection.find({}, {"_id": 0}))
+                self._snapshot = build_snapshot(version, products)
+                self._loaded_at = time.monotonic()
+                self.reloads += 1
+                print(f"INFO: Catalog snapshot loaded ({len(products)} products, version {version}).")
+            self._checked_at = time.monotonic()
+            return self._snapshot
+        finally:
+            self._lock.release()
@@ -0,0 +1,28 @@
+# class_index.py
+
+# Label decoding + critical-disease masking tables, built once per artifact load.
+# predict_disease used to call le.inverse_transform once per class (40+ sklearn calls)
+# just to find the critical classes; now masking is one multiply and decoding is an array index.
+
+import difflib
+
+import numpy as np
+
+
+class ClassIndex:
+    def __init__(self, model, label_encoder, critical_diseases):
+        # Position i of every array lines up with model.classes_[i] / predict_proba column i
+        self.class_names = np.asarray(label_encoder.inverse_transform(model.classes_), dtype=object)
+        self.critical_mask = np.isin(self.class_names, list(critical_diseases))
+        self.non_critical_weights = (~self.critical_mask).astype(np.float64)
+        self.unknown_critical = [d for d in critical_diseases if d not in set(self.class_names)]
+
+    def decode(self, position):
+        return self.class_names[position]
+
+    def report(self):
+        print(f"INFO: Class index built ({len(self.class_names)} classes, {int(self.critical_mask.sum())} critical).")
+        for name in self.unknown_critical:
+            suggestion = difflib.get_close_matches(name, list(self.class_names), n=1)
+            hint = f" Did you mean '{suggestion[0]}'?" if suggestion else ""
+            print(f"WARN: Critical disease '{name}' is not a model class and will never be masked.{hint}")
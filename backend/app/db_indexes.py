@@ -0,0 +1,145 @@
+# db_indexes.py
+
+# Index bootstrap + query-plan check for the diagnosis_system collections.
+# The API looks users up by name and pages logs/orders by (timestamp desc, _id desc) with
+# optional status/disease/username filters, but nothing ever created an index, so each of
+# those was a collection scan. ensure_indexes() runs at startup and is idempotent
+# (create_index is a no-op when the same index already exists).
+#
+# Verify every production query is served by an index (exit code 1 on any COLLSCAN):
+#   python db_indexes.py --check                       (uses MONGO_URI from .env)
+#   python db_indexes.py --check --create --uri mongodb://localhost:27017
+
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+DB_NAME = "diagnosis_system"
+
+# Newest-first keyset order used by admin_queries.SORT_ORDER
+_RECENT = [("timestamp", DESCENDING), ("_id", DESCENDING)]
+
+# collection -> [(keys, options)]
+INDEX_SPECS = {
+    "users": [
+        ([("name", ASCENDING)], {"name": "name_unique", "unique": True}),
+        # Only the few users whose profile job is still outstanding (startup resume)
+        ([("profile_status", ASCENDING)], {"name": "profile_pending", "partialFilterExpression": {"profile_status": "pending"}}),
+    ],
+    "diagnostic_logs": [
+        (_RECENT, {"name": "timestamp_desc"}),
+        ([("status", ASCENDING)] + _RECENT, {"name": "status_timestamp_desc"}),
+        ([("predicted_disease", ASCENDING)] + _RECENT, {"name": "disease_timestamp_desc"}),
+        ([("username", ASCENDING)] + _RECENT, {"name": "username_timestamp_desc"}),
+    ],
+    "orders": [
+        (_RECENT, {"name": "timestamp_desc"}),
+        ([("status", ASCENDING)] + _RECENT, {"name": "status_timestamp_desc"}),
+        ([("username", ASCENDING)] + _RECENT, {"name": "username_timestamp_desc"}),
+    ],
+    "analytics_rollups": [
+        ([("kind", ASCENDING), ("bucket", ASCENDING)], {"name": "kind_bucket"}),
+    ],
+}
+
+
+def ensure_indexes(db):
+    """Creates every index in INDEX_SPECS. Returns {collection: [index names]}; failures are reported, not raised."""
+    created = {}
+    for collection_name, specs in INDEX_SPECS.items():
+        collection = db[collection_name]
+        for keys, options in specs:
+            try:
+                created.setdefault(collection_name, []).append(collection.create_index(keys, **options))
+            except OperationFailure as e:
+                # e.g. duplicate user names already stored block the unique index
+                print(f"WARN: Could not create index {collection_name}.{options['name']}: {e}")
+    print(f"INFO: MongoDB indexes ensured ({sum(len(v) for v in created.values())} indexes).")
+    return created
+
+
+# ==========================================
+# QUERY PLAN VERIFICATION
+# ==========================================
+def production_queries():
+    """(label, collection, filter, sort, limit) for every query shape main.py issues."""
+    cursor_ts, cursor_id = datetime.now(), ObjectId()
+    after = {"$or": [{"timestamp": {"$lt": cursor_ts}}, {"timestamp": cursor_ts, "_id": {"$lt": cursor_id}}]}
+    queries = [
+        ("users by name (register/login/profile)", "users", {"name": "probe"}, None, 1),
+        ("users with pending profiles (startup resume)", "users", {"profile_status": "pending"}, None, 0),
+        ("analytics diagnosis window", "analytics_rollups",
+         {"kind": "diagnosis_hour", "bucket": {"$gte": datetime.now() - timedelta(hours=24)}}, None, 0),
+        ("analytics revenue window", "analytics_rollups",
+         {"kind": "revenue_day", "bucket": {"$gte": datetime.now() - timedelta(days=30)}}, None, 0),
+    ]
+    admin_filters = {
+        "diagnostic_logs": [{}, {"status": "EMERGENCY"}, {"predicted_disease": "Malaria"}, {"username": "probe"}],
+        "orders": [{}, {"status": "PAID"}, {"username": "probe"}],
+    }
+    for collection_name, filters in admin_filters.items():
+        for flt in filters:
+            label = f"{collection_name} page" + (f" by {next(iter(flt))}" if flt else "")
+            queries.append((label, collection_name, flt, _RECENT, 101))
+            queries.append((label + " (after cursor)", collection_name, {**flt, **after}, _RECENT, 101))
+    return queries
+
+
+def _plan_stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+def check_query_plans(db):
+    """Runs explain() on each production query. Returns the labels that use a COLLSCAN."""
+    failures = []
+    for label, collection_name, flt, sort, limit in production_queries():
+        cursor = db[collection_name].find(flt)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        stages = set(_plan_stages(cursor.explain().get("queryPlanner", {}).get("winningPlan", {})))
+        if "COLLSCAN" in stages:
+            failures.append(label)
+            verdict = "FAIL (COLLSCAN)"
+        elif "SORT" in stages:
+            verdict = "WARN (in-memory SORT)"
+        else:
+            verdict = "ok"
+        print(f"{verdict:<22} {label}: {', '.join(sorted(stages))}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create indexes and verify no production query does a COLLSCAN.")
+    parser.add_argument("--uri", help="MongoDB URI (defaults to MONGO_URI from .env)")
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--create", action="store_true", help="run ensure_indexes() before checking")
+    parser.add_argument("--check", action="store_true", help="explain() every production query")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+    db = MongoClient(args.uri or os.getenv("MONGO_URI"))[args.db]
+    if args.create or not args.check:
+        ensure_indexes(db)
+    if args.check:
+        failures = check_query_plans(db)
+        if failures:
+            print(f"ERROR: {len(failures)} production queries perform a collection scan.")
+            sys.exit(1)
+        print("INFO: Every production query is index-backed.")
@@ -0,0 +1,137 @@
+# explain_engine.py
+
+# XAI layer for the diagnosis endpoint.
+# The TreeExplainer is built ONCE when the artifacts load (building it walks every tree
+# of the XGBoost model, which used to dominate /predict tail latency). SHAP rows are then
+# cached per set of active symptoms, so repeat symptom combinations skip SHAP entirely.
+# Batched pre-fills mark their keys as in flight; explain() waits for those rows instead
+# of running a duplicate single-row SHAP call.
+
+import threading
+import time
+
+import numpy as np
+
+from cache_utils import LRUCache
+from startup import timed_import
+
+
+class ExplanationEngine:
+    def __init__(self, xgb_model, feature_names, cache_size=2048, inflight_wait_s=5.0):
+        # shap is heavy to import, so it is only pulled in when the engine is built
+        shap = timed_import("shap")
+        self.explainer = shap.TreeExplainer(xgb_model)
+        self.feature_names = list(feature_names)
+        self.feature_index = {name: i for i, name in enumerate(self.feature_names)}
+        self.cache = LRUCache(maxsize=cache_size)
+        self.inflight_wait_s = inflight_wait_s
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self.last_timing_ms = 0.0
+        self.total_timing_ms = 0.0
+        self.calls = 0
+
+    def _shap_rows(self, model_input):
+        """
+        Runs SHAP for a batch of rows.
+        Returns an array of shape (rows, features, n_outputs).
+        """
+        shap_values = self.explainer.shap_values(model_input)
+        if isinstance(shap_values, list):
+            # Older SHAP: one (rows, features) array per class
+            return np.stack([np.asarray(v) for v in shap_values], axis=-1)
+        shap_values = np.asarray(shap_values)
+        if shap_values.ndim == 3:
+            # Newer SHAP: (rows, features, classes)
+            return shap_values
+        # Single-output model: (rows, features)
+        return shap_values[:, :, None]
+
+    def _active(self, symptoms):
+        return sorted((sym, self.feature_index[sym]) for sym in set(symptoms) if sym in self.feature_index)
+
+    def _row_for(self, active):
+        row = np.zeros((1, len(self.feature_names)), dtype=np.float32)
+        row[0, [idx for _, idx in active]] = 1.0
+        return row
+
+    def reserve_batch(self, symptom_sets):
+        """
+        Marks the symptom sets that are neither cached nor already being computed as in flight.
+        The result must be passed to fill_batch, which always releases the reservation.
+        """
+        pending = {}
+        with self._inflight_lock:
+            for row, symptoms in enumerate(symptom_sets):
+                active = self._active(symptoms)
+                key = frozenset(sym for sym, _ in active)
+                if key in pending or key in self._inflight or self.cache.peek(key) is not None:
+                    continue
+                pending[key] = (row, active)
+                self._inflight[key] = threading.Event()
+        return pending
+
+    def fill_batch(self, model_inputs, pending):
+        """Runs one SHAP call for the reserved rows; row i of `model_inputs` encodes symptom set i."""
+        try:
+            if pending:
+                rows = [row for row, _ in pending.values()]
+                shap_rows = self._shap_rows(model_inputs[rows])
+                for (key, (_, active)), per_row in zip(pending.items(), shap_rows):
+                    self.cache.put(key, per_row[[idx for _, idx in active]])
+        finally:
+            with self._inflight_lock:
+                for key in pending:
+                    self._inflight.pop(key).set()
+
+    def explain_batch(self, model_inputs, symptom_sets):
+        """
+        Warms the cache for a whole batch with a single SHAP call.
+        Row i of `model_inputs` must encode `symptom_sets[i]`; already cached sets are skipped.
+        """
+        self.fill_batch(model_inputs, self.reserve_batch(symptom_sets))
+
+    def explain(self, model_input, active_symptoms, class_position):
+        """
+        Returns the sorted feature contributions of the active symptoms towards
+        the class at `class_position` of the model's classes_.
+        `model_input` may be None, in which case the row is rebuilt from the symptoms on a cache miss.
+        """
+        started = time.perf_counter()
+        active = self._active(active_symptoms)
+        cache_key = frozenset(sym for sym, _ in active)
+
+        impacts = self.cache.get(cache_key)
+        if impacts is None:
+            # A batch pre-fill may already be computing this row
+            with self._inflight_lock:
+                event = self._inflight.get(cache_key)
+            if event is not None and event.wait(self.inflight_wait_s):
+                # The miss is already counted above
+                impacts = self.cache.peek(cache_key)
+        cache_hit = impacts is not None
+        if not cache_hit:
+            if model_input is None:
+                model_input = self._row_for(active)
+            impacts = self._shap_rows(model_input)[0][[idx for _, idx in active]]
+            self.cache.put(cache_key, impacts)
+
+        column = class_position if impacts.shape[1] > 1 else 0
+        contributions = [
+            {"symptom": sym.replace('_', ' ').title(), "impact_score": round(float(impacts[row, column]), 4)}
+            for row, (sym, _) in enumerate(active)
+        ]
+        contributions.sort(key=lambda x: x['impact_score'], reverse=True)
+
+        self.last_timing_ms = (time.perf_counter() - started) * 1000
+        self.total_timing_ms += self.last_timing_ms
+        self.calls += 1
+        return contributions
+
+    def stats(self):
+        return {
+            **self.cache.stats(),
+            "calls": self.calls,
+            "last_ms": round(self.last_timing_ms, 3),
+            "avg_ms": round(self.total_timing_ms / self.calls, 3) if self.calls else 0.0,
+        }
@@ -0,0 +1,82 @@
+# feature_space.py
+
+# Symptom -> model column mapping, resolved once when the ML artifacts load.
+# Replaces the per-request {symptom: 0 for ...} dict + one-row pandas DataFrame:
+# a request only touches the columns of its active symptoms. The column order is checked
+# once against every fitted estimator's feature names, and those names are then removed
+# (strip_feature_names) so the ensemble scores plain ndarrays without the per-call
+# "X does not have valid feature names" warning and without pandas on the hot path.
+
+import threading
+
+import numpy as np
+
+
+def _fitted_names(estimator):
+    """Feature names an estimator was fitted with (sklearn attribute or XGBoost booster), else None."""
+    get_booster = getattr(estimator, "get_booster", None)
+    if get_booster is not None:
+        try:
+            names = get_booster().feature_names
+        except Exception:
+            names = None
+    else:
+        names = getattr(estimator, "feature_names_in_", None)
+    return [str(n) for n in names] if names is not None else None
+
+
+def strip_feature_names(model, expected_features):
+    """
+    Verifies that the ensemble and each of its fitted members use `expected_features` in
+    that exact order, then drops the stored names. Raises ValueError on any mismatch,
+    since scoring unlabelled arrays is only safe when every column lines up.
+    """
+    expected = [str(f) for f in expected_features]
+    members = [("ensemble", model)] + [(type(est).__name__, est) for est in getattr(model, "estimators_", [])]
+    for label, estimator in members:
+        names = _fitted_names(estimator)
+        if names is not None and names != expected:
+            raise ValueError(f"{label} was fitted with a different feature order than the ensemble")
+    for _, estimator in members:
+        if hasattr(estimator, "get_booster"):
+            estimator.get_booster().feature_names = None
+        elif "feature_names_in_" in vars(estimator):
+            del estimator.feature_names_in_
+
+
+class FeatureVectorizer:
+    def __init__(self, model, symptoms_list):
+        if hasattr(model, 'feature_names_in_'):
+            self.expected_features = [str(f) for f in model.feature_names_in_]
+        else:
+            self.expected_features = list(symptoms_list)
+        self.n_features = len(self.expected_features)
+        self.column_index = {name: i for i, name in enumerate(self.expected_features)}
+        self._local = threading.local()
+
+    def indices(self, symptoms):
+        """Column indices of the recognised symptoms (unknown symptoms are ignored)."""
+        return sorted({self.column_index[s] for s in symptoms if s in self.column_index})
+
+    def row(self, symptoms):
+        """
+        Returns a (1, n_features) float32 row with only the active columns set.
+        The buffer is reused per thread, so callers must not keep it across requests.
+        """
+        buf = getattr(self._local, "row", None)
+        if buf is None:
+            buf = np.zeros((1, self.n_features), dtype=np.float32)
+            self._local.row = buf
+            self._local.active = []
+        buf[0, self._local.active] = 0.0
+        active = self.indices(symptoms)
+        buf[0, active] = 1.0
+        self._local.active = active
+        return buf
+
+    def matrix(self, index_lists):
+        """Builds a fresh (n, n_features) matrix from several rows of column indices."""
+        out = np.zeros((len(index_lists), self.n_features), dtype=np.float32)
+        for r, cols in enumerate(index_lists):
+            out[r, cols] = 1.0
+        return out
@@ -0,0 +1,129 @@
+# followup.py
+
+# Information-gain follow-up questions for /predict.
+# With fewer than 3 known symptoms the API used to suggest a fixed pool ("headache",
+# "fatigue", "nausea", ...) whatever the current hypothesis was, which wasted a
+# conversational round trip whenever the pool did not separate the likely diseases.
+# Candidates are now scored in a single vectorized predict_proba: one row for the
+# current symptoms plus one row per unseen symptom. They are ranked by expected
+# entropy reduction of the disease posterior:
+#
+#   gain(s) = H(P(c | S)) - [ P(s | S) * H(P(c | S + s)) + (1 - P(s | S)) * H(P(c | S, not s)) ]
+#
+# P(c | S + s) comes from the model row. P(s | c) (how often a disease presents with s)
+# is estimated from data/Training.csv when available and gives both P(s | S) and the
+# "answered no" posterior. Without it, a yes is assumed as likely as a no and a no
+# leaves the posterior unchanged. Results are cached per symptom set, so repeated
+# partial sets cost one dict lookup.
+
+import csv
+import time
+
+import numpy as np
+
+from cache_utils import LRUCache
+
+
+def _entropy(p, axis=-1):
+    p = np.clip(p, 1e-12, 1.0)
+    return -(p * np.log2(p)).sum(axis=axis)
+
+
+def load_symptom_likelihoods(csv_path, class_names, features):
+    """
+    P(symptom | disease) from the training CSV as a (n_classes, n_features) array,
+    Laplace-smoothed. Classes or columns missing from the CSV get 0.5 (uninformative).
+    """
+    class_row = {str(name).strip(): i for i, name in enumerate(class_names)}
+    counts = np.zeros((len(class_names), len(features)), dtype=np.float64)
+    totals = np.zeros(len(class_names), dtype=np.float64)
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = [h.strip() for h in next(reader)]
+        label_col = header.index("prognosis")
+        feature_pos = {name: i for i, name in enumerate(features)}
+        # CSV column -> feature position (CSV headers may carry stray spaces)
+        column_map = [(j, feature_pos[h]) for j, h in enumerate(header) if h in feature_pos]
+        for row in reader:
+            if len(row) <= label_col:
+                continue
+            c = class_row.get(row[label_col].strip())
+            if c is None:
+                continue
+            totals[c] += 1
+            for j, f_pos in column_map:
+                if row[j].strip() == "1":
+                    counts[c, f_pos] += 1
+
+    likelihood = (counts + 1) / (totals[:, None] + 2)
+    seen_columns = np.zeros(len(features), dtype=bool)
+    seen_columns[[f_pos for _, f_pos in column_map]] = True
+    likelihood[totals == 0, :] = 0.5
+    likelihood[:, ~seen_columns] = 0.5
+    return likelihood
+
+
+class FollowUpSelector:
+    def __init__(self, model, vectorizer, class_names, symptoms_list, training_csv=None, cache_size=4096):
+        self.model = model
+        self.vectorizer = vectorizer
+        # Only symptoms the model can actually score are worth asking about
+        self.candidates = [s for s in dict.fromkeys(symptoms_list) if s in vectorizer.column_index]
+        self.candidate_cols = np.array([vectorizer.column_index[s] for s in self.candidates], dtype=np.intp)
+        self.likelihood = None
+        if training_csv:
+            try:
+                full = load_symptom_likelihoods(training_csv, class_names, vectorizer.expected_features)
+                self.likelihood = full[:, self.candidate_cols]
+            except (OSError, ValueError, StopIteration) as e:
+                print(f"WARN: Symptom likelihoods unavailable ({e}); follow-ups will use model scores only.")
+        self.cache = LRUCache(maxsize=cache_size)
+        self.computed = 0
+        self.total_ms = 0.0
+
+    def suggest(self, symptoms, k=4):
+        """Top-k unseen symptoms by expected information gain, best first."""
+        key = (frozenset(symptoms), k)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return list(cached)
+
+        start = time.perf_counter()
+        current_cols = self.vectorizer.indices(symptoms)
+        known = set(current_cols)
+        open_positions = np.array([i for i, col in enumerate(self.candidate_cols) if col not in known], dtype=np.intp)
+        if open_positions.size == 0:
+            return []
+
+        # Row 0: current symptoms; row i+1: current symptoms + candidate i
+        matrix = self.vectorizer.matrix([current_cols] * (open_positions.size + 1))
+        matrix[np.arange(1, open_positions.size + 1), self.candidate_cols[open_positions]] = 1.0
+        probabilities = self.model.predict_proba(matrix)
+        prior, posterior_yes = probabilities[0], probabilities[1:]
+
+        if self.likelihood is not None:
+            lik = self.likelihood[:, open_positions]                    # (classes, candidates)
+            p_yes = prior @ lik                                         # P(s | S)
+            posterior_no = prior[:, None] * (1.0 - lik)
+            posterior_no = (posterior_no / posterior_no.sum(axis=0, keepdims=True)).T
+            expected = p_yes * _entropy(posterior_yes) + (1.0 - p_yes) * _entropy(posterior_no)
+        else:
+            expected = 0.5 * _entropy(posterior_yes) + 0.5 * _entropy(prior)
+        gain = _entropy(prior) - expected
+
+        # Stable sort keeps symptoms_list order between equal gains
+        best = np.argsort(-gain, kind="stable")[:k]
+        suggestions = tuple(self.candidates[open_positions[i]] for i in best)
+        self.cache.put(key, suggestions)
+        self.computed += 1
+        self.total_ms += (time.perf_counter() - start) * 1000
+        return list(suggestions)
+
+    def stats(self):
+        return {
+            **self.cache.stats(),
+            "candidates": len(self.candidates),
+            "likelihoods": self.likelihood is not None,
+            "computed": self.computed,
+            "avg_compute_ms": round(self.total_ms / self.computed, 3) if self.computed else 0.0,
+        }
@@ -0,0 +1,77 @@
+# fuzzy_index.py
+
+# Typo-tolerant lookups for symptom_nlp, vectorized with rapidfuzz.
+# The fuzzy fallback used to call thefuzz's process.extractOne twice per word (against
+# VALID_SYMPTOMS and a clean_list rebuilt on every request, then clean_list.index() to
+# map back), and the DIRECT_CONDITION_MAP loop called fuzz.ratio for every
+# word x condition. A long complaint made that quadratic in pure Python. The choice
+# arrays are now preprocessed once and every word of a request is scored in a single
+# rapidfuzz.process.cdist call per table.
+#
+# Parity with thefuzz:
+#   - extractOne(word, choices) = WRatio over full_process'd strings (Latin-1 range
+#     stripped, then rapidfuzz default_process). The first best choice wins and the score
+#     is rounded to an int before the >= 85 test.
+#   - fuzz.ratio(condition, word) = unprocessed Ratio, rounded to an int.
+
+import numpy as np
+from rapidfuzz import fuzz
+from rapidfuzz.process import cdist
+from rapidfuzz.utils import default_process
+
+# thefuzz.utils.asciionly drops code points 128-255 only
+_LATIN1_DROP = {i: None for i in range(128, 256)}
+
+
+def full_process(text):
+    """thefuzz.utils.full_process(text, force_ascii=True), as used by extractOne's default WRatio."""
+    return default_process(str(text).translate(_LATIN1_DROP))
+
+
+class FuzzySymptomIndex:
+    def __init__(self, valid_symptoms, conditions, threshold=85, min_symptom_word=5, min_condition_word=4):
+        self.valid_symptoms = list(valid_symptoms)
+        self.threshold = threshold
+        self.min_symptom_word = min_symptom_word
+        self.min_condition_word = min_condition_word
+        # Both spellings the old code tried: "stomach_pain" and "stomach pain"
+        self._symptom_choices = [full_process(s) for s in self.valid_symptoms]
+        self._clean_choices = [full_process(s.replace("_", " ")) for s in self.valid_symptoms]
+        # Conditions shorter than the minimum word length were never fuzzy-matched
+        self.conditions = [c for c in conditions if len(c) >= min_condition_word]
+
+    def match_symptoms(self, words):
+        """
+        Symptoms the old per-word extractOne fallback would have added for `words`:
+        the underscore spelling is tried first, the spaced spelling second.
+        """
+        queries = list(dict.fromkeys(w for w in words if len(w) >= self.min_symptom_word))
+        if not queries or not self.valid_symptoms:
+            return set()
+        processed = [full_process(w) for w in queries]
+        matched = set()
+        direct, direct_score = self._best(processed, self._symptom_choices)
+        clean, clean_score = self._best(processed, self._clean_choices)
+        for i in range(len(queries)):
+            if direct_score[i] >= self.threshold:
+                matched.add(self.valid_symptoms[direct[i]])
+            elif clean_score[i] >= self.threshold:
+                matched.add(self.valid_symptoms[clean[i]])
+        return matched
+
+    def match_conditions(self, words, skip=()):
+        """Conditions (not in `skip`) whose fuzz.ratio against any word of length >= 4 reaches the threshold."""
+        conditions = [c for c in self.conditions if c not in skip]
+        queries = list(dict.fromkeys(w for w in words if len(w) >= self.min_condition_word))
+        if not conditions or not queries:
+            return set()
+        scores = np.rint(cdist(conditions, queries, scorer=fuzz.ratio, processor=None))
+        hits = (scores >= self.threshold).any(axis=1)
+        return {c for c, hit in zip(conditions, hits) if hit}
+
+    @staticmethod
+    def _best(processed_queries, processed_choices):
+        scores = cdist(processed_queries, processed_choices, scorer=fuzz.WRatio, processor=None)
+        # argmax returns the first maximum, matching extractOne's first-best tie-breaking
+        best = scores.argmax(axis=1)
+        return best, np.rint(scores[np.arange(len(processed_queries)), best])
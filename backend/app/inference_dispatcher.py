@@ -0,0 +1,174 @@
+# inference_dispatcher.py
+
+# Micro-batching front for the soft-voting ensemble.
+# Concurrent /predict threads each hand over their active column indices; a single worker
+# thread collects them for a short window (or until max_batch rows), runs ONE predict_proba
+# for the whole batch, resolves every waiting request, and then pre-fills the SHAP cache
+# with ONE call (requests that reach explain() first wait on that call instead of
+# repeating it). After close() or while the queue is full, rows are scored inline on the
+# caller's thread, so a request never waits on a dispatcher that will not serve it.
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128]
+
+
+class InferenceDispatcher:
+    def __init__(self, model, vectorizer, explanation_engine=None, window_ms=2.0, max_batch=32, max_queue=4096):
+        self.model = model
+        self.vectorizer = vectorizer
+        self.explanation_engine = explanation_engine
+        self.window_s = max(float(window_ms), 0.0) / 1000.0
+        self.max_batch = max(int(max_batch), 1)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self._batch_histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self._batch_histogram["+Inf"] = 0
+        self._depth_histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self._depth_histogram["+Inf"] = 0
+        self.batches = 0
+        self.rows = 0
+        self.max_queue_depth = 0
+        self._closed = False
+        self._submit_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="inference-dispatcher", daemon=True)
+        self._worker.start()
+
+    @classmethod
+    def from_env(cls, model, vectorizer, explanation_engine=None):
+        return cls(
+            model,
+            vectorizer,
+            explanation_engine,
+            window_ms=float(os.getenv("INFERENCE_BATCH_WINDOW_MS", "2")),
+            max_batch=int(os.getenv("INFERENCE_MAX_BATCH", "32")),
+        )
+
+    # ------------------------------------------
+    # Request side
+    # ------------------------------------------
+    def submit(self, symptoms):
+        """Queues one row; the Future resolves to its predict_proba row."""
+        future = Future()
+        item = (self.vectorizer.indices(symptoms), list(symptoms), future)
+        # Held across the put so nothing can be queued behind close()'s sentinel
+        with self._submit_lock:
+            if not self._closed:
+                depth = self._queue.qsize()
+                self._observe(self._depth_histogram, depth)
+                if depth > self.max_queue_depth:
+                    self.max_queue_depth = depth
+                try:
+                    self._queue.put_nowait(item)
+                    return future
+                except queue.Full:
+                    pass
+        # Closed (swapped out by a model reload) or saturated: score on the caller's thread
+        self._process([item])
+        return future
+
+    def predict_proba(self, symptoms, timeout=10.0):
+        return self.submit(symptoms).result(timeout=timeout)
+
+    # ------------------------------------------
+    # Worker side
+    # ------------------------------------------
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.window_s
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            self._process(batch)
+
+    def _process(self, batch):
+        futures = [future for _, _, future in batch]
+        try:
+            matrix = self.vectorizer.matrix([indices for indices, _, _ in batch])
+            probabilities = self.model.predict_proba(matrix)
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        pending = None
+        if self.explanation_engine is not None:
+            try:
+                # Reserved before the rows are released, so explain() waits for this batch
+                pending = self.explanation_engine.reserve_batch([symptoms for _, symptoms, _ in batch])
+            except Exception as e:
+                print(f"WARN: Batched SHAP reservation failed: {e}")
+
+        for future, row in zip(futures, probabilities):
+            future.set_result(row)
+
+        with self._stats_lock:
+            self.batches += 1
+            self.rows += len(batch)
+        self._observe(self._batch_histogram, len(batch))
+
+        if pending is not None:
+            try:
+                self.explanation_engine.fill_batch(matrix, pending)
+            except Exception as e:
+                # Explanations are best-effort; /predict recomputes on a cache miss
+                print(f"WARN: Batched SHAP failed: {e}")
+
+    def _observe(self, histogram, value):
+        with self._stats_lock:
+            for bucket in BATCH_SIZE_BUCKETS:
+                if value <= bucket:
+                    histogram[bucket] += 1
+                    return
+            histogram["+Inf"] += 1
+
+    def close(self):
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+        # The worker finishes every row queued ahead of the sentinel
+        try:
+            self._queue.put(None, timeout=5)
+        except queue.Full:
+            pass
+        self._worker.join(timeout=5)
+        # Whatever a stuck worker left behind fails now instead of timing out in predict_proba
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[2].set_exception(RuntimeError("Inference dispatcher closed"))
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "window_ms": self.window_s * 1000,
+                "max_batch": self.max_batch,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "batches": self.batches,
+                "rows": self.rows,
+                "avg_batch_size": round(self.rows / self.batches, 3) if self.batches else 0.0,
+                "batch_size_histogram": {str(k): v for k, v in self._batch_histogram.items()},
+                "queue_depth_histogram": {str(k): v for k, v in self._depth_histogram.items()},
+            }
@@ -0,0 +1,222 @@
+# kb_manager.py
+
+# Hot-reloadable Ayurveda knowledge base.
+# The KB used to be a module global read once at import, so every pipeline run meant
+# restarting all workers. KBManager parses and validates a new KB off the request path,
+# rebuilds its derived indexes (prescription table + diagnosis alias map) and then swaps
+# a single versioned snapshot reference. Requests read `kb_manager.current` once and use
+# that snapshot throughout, so a reload never mixes two KB versions in one response.
+# medicine_master.json only stands in when the structured KB is missing, or is unusable
+# at the very first load; a bad structured KB on hot reload keeps the current snapshot.
+# The watcher waits until a file's mtime/size are unchanged across two polls, so it never
+# picks up a file that is still being written.
+
+import hashlib
+import itertools
+import json
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+
+from kb_resolver import DiseaseKBResolver
+from prescription_table import PrescriptionTable
+
+
+def _normalize_list(value):
+    if isinstance(value, str):
+        return [value.strip().lower()]
+    if isinstance(value, list):
+        return [str(v).strip().lower() for v in value if str(v).strip()]
+    return []
+
+# YOUR CUSTOM DB BUILDER
+def _build_db_from_medicine_master(master_data):
+    ages = ["young", "middle", "elder"]
+    genders = ["male", "female"]
+    severities = ["low", "medium", "high"]
+    structured = {}
+
+    for disease, medicines in master_data.items():
+        disease_key = str(disease).strip()
+        if not disease_key or not isinstance(medicines, list):
+            continue
+        disease_bucket = {}
+
+        for age, gender, severity in itertools.product(ages, genders, severities):
+            combo_key = f"{age}_{gender}_{severity}"
+            candidates = []
+            for med in medicines:
+                if not isinstance(med, dict):
+                    continue
+
+                allowed_ages = _normalize_list(med.get("allowed_ages", ["all"]))
+                allowed_genders = _normalize_list(med.get("allowed_genders", ["all"]))
+                allowed_severities = _normalize_list(med.get("allowed_severities", ["low", "medium", "high"]))
+
+                age_ok = "all" in allowed_ages or age in allowed_ages
+                gender_ok = "all" in allowed_genders or gender in allowed_genders
+                severity_ok = "all" in allowed_severities or severity in allowed_severities
+                if not (age_ok and gender_ok and severity_ok):
+                    continue
+
+                candidates.append(
+                    {
+                        "medicine_name": med.get("medicine_name", "Ayurvedic Protocol"),
+                        "dosage": med.get("dosage", "Standard Dose"),
+                        "formulation_type": med.get("formulation_type", "classical"),
+                        "dosha_type": med.get("dosha_type", "tridosha"),
+                        "herb_sanskrit": med.get("herb_sanskrit", []),
+                    }
+                )
+            disease_bucket[combo_key] = candidates
+        structured[disease_key] = disease_bucket
+    return structured
+
+
+def validate_kb(ayurveda_db):
+    """Raises ValueError when the KB does not have the shape phase 4 expects."""
+    if not isinstance(ayurveda_db, dict):
+        raise ValueError("KB root must be an object keyed by disease")
+    for disease, disease_data in ayurveda_db.items():
+        buckets = disease_data.values() if isinstance(disease_data, dict) else [disease_data]
+        for bucket in buckets:
+            if not isinstance(bucket, list):
+                raise ValueError(f"'{disease}': protocol lists expected, got {type(bucket).__name__}")
+            for med in bucket:
+                if isinstance(med, dict) and not isinstance(med.get("dosage", ""), str):
+                    raise ValueError(f"'{disease}': dosage must be a string")
+
+
+@dataclass(frozen=True)
+class KBSnapshot:
+    version: str
+    source: str
+    db: MappingProxyType
+    prescription_table: PrescriptionTable
+    resolver: DiseaseKBResolver
+    loaded_at: datetime
+
+
+class KBManager:
+    def __init__(self, kb_path, master_path, disease_names=lambda: []):
+        self.kb_path = kb_path
+        self.master_path = master_path
+        # Callable returning every diagnosis name the API can emit (for the alias map)
+        self.disease_names = disease_names
+        self._current = self._build({}, "empty", "none")
+        self._lock = threading.Lock()
+        self._file_stamps = None
+        self._watcher = None
+        self._stop = threading.Event()
+        self.reloads = 0
+        self.failed_reloads = 0
+
+    @property
+    def current(self):
+        return self._current
+
+    def _build(self, ayurveda_db, version, source, report=False):
+        # Render every (disease, age, gender, severity, pregnancy) protocol once
+        table = PrescriptionTable(ayurveda_db)
+        resolver = DiseaseKBResolver(ayurveda_db.keys(), sorted(set(self.disease_names())))
+        if report:
+            print(f"INFO: Prescription table compiled ({len(table)} entries).")
+            resolver.report()
+        return KBSnapshot(version, source, MappingProxyType(ayurveda_db), table, resolver, datetime.now())
+
+    def _stamps(self):
+        return tuple(
+            (os.stat(p).st_mtime_ns, os.stat(p).st_size) if os.path.exists(p) else None
+            for p in (self.kb_path, self.master_path)
+        )
+
+    def _read(self, allow_fallback):
+        """
+        Returns (db, version, source) from the structured KB. A missing structured KB falls
+        back to medicine_master.json; a corrupt or schema-invalid one only does so when
+        allow_fallback is set (initial load) and raises otherwise.
+        """
+        try:
+            with open(self.kb_path, "rb") as f:
+                raw = f.read()
+            ayurveda_db = json.loads(raw.decode("utf-8"))
+            validate_kb(ayurveda_db)
+            return ayurveda_db, hashlib.sha1(raw).hexdigest()[:12], "ayurveda_kb_structured.json"
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            if not allow_fallback:
+                raise ValueError(f"{self.kb_path} unusable ({e})") from e
+            print(f"WARN: {self.kb_path} unusable ({e}); falling back to medicine_master.json.")
+        with open(self.master_path, "rb") as f:
+            raw = f.read()
+        ayurveda_db = _build_db_from_medicine_master(json.loads(raw.decode("utf-8")))
+        validate_kb(ayurveda_db)
+        return ayurveda_db, hashlib.sha1(raw).hexdigest()[:12], "medicine_master.json"
+
+    def load(self):
+        """Parses, validates and indexes the KB, then atomically swaps it in. Returns the active snapshot."""
+        with self._lock:
+            stamps = self._stamps()
+            try:
+                ayurveda_db, version, source = self._read(allow_fallback=self._current.source == "none")
+            except Exception as e:
+                self.failed_reloads += 1
+                # Remembered so the watcher retries only once the files change again
+                self._file_stamps = stamps
+                print(f"ERROR: Ayurveda KB load failed, keeping version {self._current.version}: {e}")
+                return self._current
+            snapshot = self._build(ayurveda_db, version, source, report=True)
+            self._current = snapshot
+            self._file_stamps = stamps
+            self.reloads += 1
+            print(f"INFO: Ayurveda KB version {version} active (from {source}, {len(ayurveda_db)} diseases).")
+            return snapshot
+
+    def rebuild_aliases(self):
+        """Re-derives the alias map for the current KB (e.g. after the model classes changed)."""
+        with self._lock:
+            snap = self._current
+            resolver = DiseaseKBResolver(snap.db.keys(), sorted(set(self.disease_names())))
+            if snap.db:
+                resolver.report()
+            self._current = KBSnapshot(snap.version, snap.source, snap.db, snap.prescription_table, resolver, snap.loaded_at)
+
+    # ------------------------------------------
+    # File watcher
+    # ------------------------------------------
+    def start_watcher(self, interval):
+        if interval <= 0 or self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="kb-watcher", daemon=True)
+        self._watcher.start()
+
+    def _watch(self, interval):
+        pending = None
+        while not self._stop.wait(interval):
+            stamps = self._stamps()
+            if self._file_stamps is None or stamps == self._file_stamps:
+                pending = None
+            elif stamps != pending:
+                # Changed since the last poll: wait until the writer is done with it
+                pending = stamps
+            else:
+                print("INFO: Ayurveda KB change detected, reloading...")
+                pending = None
+                self.load()
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    def stats(self):
+        snap = self._current
+        return {
+            "version": snap.version,
+            "source": snap.source,
+            "diseases": len(snap.db),
+            "loaded_at": snap.loaded_at.isoformat(),
+            "reloads": self.reloads,
+            "failed_reloads": self.failed_reloads,
+        }
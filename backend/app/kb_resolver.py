@@ -0,0 +1,52 @@
+# kb_resolver.py
+
+# Maps diagnosis names (label-encoder classes + heuristic rule outputs) to Ayurveda KB keys.
+# Names like "Diabetes " or "Peptic ulcer diseae" never match a KB key exactly, so phase 4
+# used to fuzzy-score every KB key on every request. Both sides are fixed once loaded, so
+# the best match is computed up front and the per-request lookup is a dict hit.
+
+import threading
+
+from thefuzz import process
+
+MIN_MATCH_SCORE = 70
+
+
+class DiseaseKBResolver:
+    def __init__(self, kb_keys, disease_names, min_score=MIN_MATCH_SCORE):
+        self.kb_keys = list(kb_keys)
+        self.min_score = min_score
+        # disease name -> (kb key or None, score)
+        self.alias_map = {}
+        self._lock = threading.Lock()
+        for name in disease_names:
+            self.alias_map[name] = self._match(name)
+
+    def _match(self, name):
+        if not self.kb_keys:
+            return None, 0
+        best_match, score = process.extractOne(name, self.kb_keys)
+        return (best_match if score >= self.min_score else None), score
+
+    def resolve(self, disease):
+        """Returns the KB key for a diagnosis, or None when no key scores >= min_score."""
+        entry = self.alias_map.get(disease)
+        if entry is None:
+            # Unseen name (e.g. a label added after the last build): match once and memoize
+            entry = self._match(disease)
+            with self._lock:
+                self.alias_map[disease] = entry
+        return entry[0]
+
+    def report(self, low_score=85):
+        unmapped = sorted(name for name, (key, _) in self.alias_map.items() if key is None)
+        weak = sorted(
+            (name, key, score) for name, (key, score) in self.alias_map.items()
+            if key is not None and name.strip() != key and score < low_score
+        )
+        print(f"INFO: KB alias map built ({len(self.alias_map) - len(unmapped)}/{len(self.alias_map)} diagnoses mapped).")
+        if unmapped:
+            print(f"WARN: No Ayurveda KB entry for: {', '.join(unmapped)}")
+        for name, key, score in weak:
+            print(f"WARN: Low-confidence KB alias '{name}' -> '{key}' (score {score}).")
+        return {"unmapped": unmapped, "low_score": [{"disease": n, "kb_key": k, "score": s} for n, k, s in weak]}
@@ -0,0 +1,302 @@
+# llm_cache.py
+
+# Shared call layer for every Gemini prompt the backend sends.
+# Profile generation (/register) and catalog seeding used to hit the API for every call,
+# even when the answer was already known: near-identical biometrics produced separate
+# profiles, and each reseed re-described products we had already described. Responses
+# are now stored in a local SQLite file keyed by (model, normalized prompt), with TTL and
+# size-based eviction. Profile prompts are built from bucketed biometrics so that users
+# who differ by a kilo or a centimetre share one cached answer. Structured results
+# derived from a response (e.g. one catalog product out of a batch) live in a separate
+# namespaced record table, never under synthetic prompts.
+#
+#   LLM_CACHE=sqlite (default) | memory | off
+#   LLM_CACHE_PATH, LLM_CACHE_TTL_DAYS, LLM_CACHE_MAX_ENTRIES
+#   LLM_BACKEND=stub  -> deterministic local responses, no API key needed
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt):
+    """Collapses whitespace so re-indented or re-wrapped prompts share a cache key."""
+    return _WHITESPACE.sub(" ", str(prompt)).strip()
+
+
+def cache_key(model, prompt):
+    return hashlib.sha256(f"{model}\x00{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+
+def bucket_biometrics(profile_data, age_step=5, weight_step=3, height_step=3):
+    """
+    Quantizes the fields the dosha prompt depends on and drops identifying ones (name).
+    Returns a dict with a stable key order, ready to be embedded in a prompt.
+    """
+    def _q(value, step):
+        return int(round(float(value) / step) * step) if value is not None else None
+
+    bucketed = {
+        "age": _q(profile_data.get("age"), age_step),
+        "gender": str(profile_data.get("gender", "")).strip().lower(),
+        "weight": _q(profile_data.get("weight"), weight_step),
+        "height": _q(profile_data.get("height"), height_step),
+    }
+    for field in ("digestion", "sleep", "weather", "frame"):
+        if field in profile_data:
+            bucketed[field] = str(profile_data[field]).strip().lower()
+    return bucketed
+
+
+class _CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def snapshot(self, backend, size, max_entries, ttl_seconds):
+        lookups = self.hits + self.misses
+        return {
+            "backend": backend,
+            "size": size,
+            "max_entries": max_entries,
+            "ttl_seconds": ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class LLMCache:
+    """SQLite-backed response cache. Safe to share between threads; local file only."""
+
+    def __init__(self, path, ttl_seconds=30 * 86400, max_entries=50000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_responses ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, response TEXT NOT NULL,"
+            " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_responses_accessed ON llm_responses (accessed_at)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_records ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, created_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._lock = threading.Lock()
+        self._stats = _CacheStats()
+
+    @classmethod
+    def from_env(cls, default_path):
+        mode = os.getenv("LLM_CACHE", "sqlite").lower()
+        ttl = float(os.getenv("LLM_CACHE_TTL_DAYS", "30")) * 86400
+        max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+        if mode == "off":
+            return MemoryLLMCache(ttl_seconds=ttl, max_entries=0)
+        if mode == "memory":
+            return MemoryLLMCache(ttl_seconds=ttl, max_entries=max_entries)
+        path = os.getenv("LLM_CACHE_PATH", default_path)
+        try:
+            return cls(path, ttl_seconds=ttl, max_entries=max_entries)
+        except sqlite3.Error as e:
+            print(f"WARN: LLM cache at {path} unavailable, using in-memory cache: {e}")
+            return MemoryLLMCache(ttl_seconds=ttl, max_entries=max_entries)
+
+    def get(self, model, prompt):
+        key = cache_key(model, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                self._stats.expired += 1
+                row = None
+            if row is None:
+                self._stats.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._stats.hits += 1
+            return row[0]
+
+    def put(self, model, prompt, response):
+        if not self.max_entries:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, model, response, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (cache_key(model, prompt), model, response, now, now),
+            )
+            self._stats.stores += 1
+            self._evict()
+
+    def get_record(self, namespace, key):
+        """Structured record stored by put_record (expires with the same TTL as responses)."""
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM llm_records WHERE namespace = ? AND key = ?", (namespace, key)).fetchone()
+            if row is None or (self.ttl_seconds and time.time() - row[1] > self.ttl_seconds):
+                return None
+            return row[0]
+
+    def put_record(self, namespace, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_records (namespace, key, value, created_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, value, time.time()),
+            )
+
+    def _evict(self):
+        if self.ttl_seconds:
+            expired = self._conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)).rowcount
+            self._stats.expired += max(expired, 0)
+        overflow = self._size() - self.max_entries
+        if overflow > 0:
+            # Least recently read entries go first
+            self._conn.execute(
+                "DELETE FROM llm_responses WHERE key IN (SELECT key FROM llm_responses ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+            self._stats.evictions += overflow
+
+    def _size(self):
+        return self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_responses")
+            self._conn.execute("DELETE FROM llm_records")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self):
+        with self._lock:
+            return self._stats.snapshot("sqlite", self._size(), self.max_entries, self.ttl_seconds)
+
+
+class MemoryLLMCache:
+    """Same interface as LLMCache, held in process memory (tests, LLM_CACHE=memory/off)."""
+
+    def __init__(self, ttl_seconds=None, max_entries=1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._records = {}
+        self._lock = threading.Lock()
+        self._stats = _CacheStats()
+
+    def get(self, model, prompt):
+        key = cache_key(model, prompt)
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and self.ttl_seconds and time.time() - item[1] > self.ttl_seconds:
+                del self._data[key]
+                self._stats.expired += 1
+                item = None
+            if item is None:
+                self._stats.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._stats.hits += 1
+            return item[0]
+
+    def put(self, model, prompt, response):
+        if not self.max_entries:
+            return
+        with self._lock:
+            key = cache_key(model, prompt)
+            self._data[key] = (response, time.time())
+            self._data.move_to_end(key)
+            self._stats.stores += 1
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._stats.evictions += 1
+
+    def get_record(self, namespace, key):
+        with self._lock:
+            item = self._records.get((namespace, key))
+            if item is None or (self.ttl_seconds and time.time() - item[1] > self.ttl_seconds):
+                return None
+            return item[0]
+
+    def put_record(self, namespace, key, value):
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._records[(namespace, key)] = (value, time.time())
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._records.clear()
+
+    def close(self):
+        pass
+
+    def stats(self):
+        with self._lock:
+            return self._stats.snapshot("memory" if self.max_entries else "off", len(self._data), self.max_entries, self.ttl_seconds)
+
+
+class StubLLMBackend:
+    """
+    Deterministic stand-in for the Gemini API.
+    `responder(prompt) -> str` decides the reply; by default a small JSON echo of the prompt hash.
+    """
+
+    def __init__(self, responder=None):
+        self.responder = responder
+        self.calls = 0
+
+    def __call__(self, prompt, timeout=None):
+        self.calls += 1
+        if self.responder is not None:
+            return self.responder(prompt)
+        digest = hashlib.sha1(normalize_prompt(prompt).encode("utf-8")).hexdigest()[:12]
+        return json.dumps({"stub": True, "prompt_sha": digest})
+
+
+class LLMClient:
+    """
+    backend(prompt, timeout) -> response text (Gemini or StubLLMBackend).
+    Only successful backend replies are cached, so a failure is retried on the next call.
+    """
+
+    def __init__(self, backend, cache, model_name):
+        self.backend = backend
+        self.cache = cache
+        self.model_name = model_name
+        self.backend_calls = 0
+
+    def generate(self, prompt, timeout=None, validate=None):
+        """`validate(text)` may raise to keep a malformed reply out of the cache."""
+        cached = self.cache.get(self.model_name, prompt)
+        if cached is not None:
+            return cached
+        self.backend_calls += 1
+        text = self.backend(prompt, timeout=timeout)
+        if validate is not None:
+            validate(text)
+        self.cache.put(self.model_name, prompt, text)
+        return text
+
+    def stats(self):
+        return {"model": self.model_name, "backend_calls": self.backend_calls, **self.cache.stats()}
@@ -0,0 +1,221 @@
+# log_sink.py
+
+# Buffered, asynchronous writer for diagnostic_logs.
+# /predict used to pay a synchronous insert_one (a full MongoDB round trip) per diagnosis.
+# Records are now queued in memory and flushed by a background thread with
+# insert_many(ordered=False) when the batch fills up or the flush interval elapses.
+# If MongoDB is unreachable the batch is appended to a local spill file and replayed
+# on the next successful flush, so no diagnosis record is lost. Spilled records keep their
+# _id, so a batch that reached the server before the error is rejected as a duplicate on
+# replay instead of being inserted (and counted by the rollups) twice. A spill line that
+# no longer decodes (e.g. truncated by a crash mid-write) is moved to <spill>.corrupt and
+# the rest of the file is still replayed; nothing in a flush round can stop the flusher.
+
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, ObjectId):
+        return {"__oid__": str(value)}
+    return str(value)
+
+
+def _decode(obj):
+    if "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    if "__oid__" in obj:
+        return ObjectId(obj["__oid__"])
+    return obj
+
+
+class DiagnosticLogSink:
+    def __init__(self, collection, batch_size=200, flush_interval=1.0, max_queue=10000,
+                 spill_path=None, put_timeout=0.5, on_flush=None):
+        self.collection = collection
+        # Called with every batch of records that reached MongoDB (e.g. analytics rollups)
+        self.on_flush = on_flush
+        self.batch_size = max(int(batch_size), 1)
+        self.flush_interval = float(flush_interval)
+        self.put_timeout = float(put_timeout)
+        self.spill_path = spill_path
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._spill_lock = threading.Lock()
+        self.written = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.failed_flushes = 0
+        self._worker = threading.Thread(target=self._run, name="log-sink", daemon=True)
+        self._worker.start()
+
+    @classmethod
+    def from_env(cls, collection, spill_path, on_flush=None):
+        return cls(
+            collection,
+            batch_size=int(os.getenv("LOG_SINK_BATCH_SIZE", "200")),
+            flush_interval=float(os.getenv("LOG_SINK_FLUSH_INTERVAL", "1.0")),
+            max_queue=int(os.getenv("LOG_SINK_MAX_QUEUE", "10000")),
+            spill_path=os.getenv("LOG_SINK_SPILL_PATH", spill_path),
+            on_flush=on_flush,
+        )
+
+    # ------------------------------------------
+    # Producer side (request threads)
+    # ------------------------------------------
+    def write(self, record, sync=False):
+        self.write_many([record], sync=sync)
+
+    def write_many(self, records, sync=False):
+        """
+        Queues records for the background flusher.
+        With sync=True the records are inserted before returning (used for EMERGENCY logs);
+        they are still spilled to disk rather than raised if MongoDB is down.
+        """
+        if not records:
+            return
+        if sync:
+            self._insert(list(records))
+            return
+        for record in records:
+            try:
+                # Backpressure: block briefly on a full queue, then spill instead of dropping
+                self._queue.put(record, timeout=self.put_timeout)
+            except queue.Full:
+                self._spill([record])
+
+    # ------------------------------------------
+    # Background flusher
+    # ------------------------------------------
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0.001))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                if (self._insert(batch) if batch else not stopping):
+                    self._replay_spill()
+            except Exception as e:
+                # e.g. the spill disk is full; the flusher must survive to drain the queue
+                print(f"ERROR: Diagnostic log flush round failed: {e}")
+
+    def _insert(self, records):
+        """Returns False when MongoDB was unreachable and the records went to the spill file."""
+        try:
+            self.collection.insert_many(records, ordered=False)
+            self.written += len(records)
+            self._notify(records)
+        except BulkWriteError as e:
+            # Partial success: only individually rejected documents are lost (e.g. duplicate _id)
+            details = e.details or {}
+            rejected = {err.get("index") for err in details.get("writeErrors", [])}
+            self.written += details.get("nInserted", 0)
+            self._notify([r for i, r in enumerate(records) if i not in rejected])
+            print(f"WARN: {len(rejected)} diagnostic log(s) rejected by MongoDB.")
+        except Exception as e:
+            # PyMongoError, or AttributeError when MongoDB never connected (collection=None)
+            self.failed_flushes += 1
+            print(f"WARN: Diagnostic log flush failed ({e}); spilling {len(records)} record(s) to disk.")
+            self._spill(records)
+            return False
+        return True
+
+    def _notify(self, records):
+        if self.on_flush is None or not records:
+            return
+        try:
+            self.on_flush(records)
+        except Exception as e:
+            print(f"WARN: Log sink flush hook failed: {e}")
+
+    def _spill(self, records, count=True):
+        if not self.spill_path:
+            print(f"ERROR: No spill file configured; dropping {len(records)} diagnostic log(s).")
+            return
+        with self._spill_lock:
+            os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for record in records:
+                    # insert_many already assigned _id to anything it tried to send; keep it
+                    record.setdefault("_id", ObjectId())
+                    f.write(json.dumps(record, default=_encode) + "\n")
+            if count:
+                self.spilled += len(records)
+
+    def _replay_spill(self):
+        if not self.spill_path or self.collection is None:
+            return
+        replay_path = self.spill_path + ".replaying"
+        with self._spill_lock:
+            # A .replaying file left by a crash mid-replay is replayed first; the spill
+            # file then waits for the next round
+            if not os.path.exists(replay_path):
+                if not os.path.exists(self.spill_path):
+                    return
+                os.replace(self.spill_path, replay_path)
+        records, corrupt = [], []
+        with open(replay_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line, object_hook=_decode))
+                except Exception:
+                    corrupt.append(line if line.endswith("\n") else line + "\n")
+        if corrupt:
+            with open(self.spill_path + ".corrupt", "a", encoding="utf-8") as f:
+                f.writelines(corrupt)
+            print(f"ERROR: {len(corrupt)} unreadable spilled diagnostic log(s) moved to {self.spill_path}.corrupt")
+        try:
+            if records:
+                self.collection.insert_many(records, ordered=False)
+            self.replayed += len(records)
+            self._notify(records)
+            print(f"INFO: Replayed {len(records)} spilled diagnostic log(s).")
+        except BulkWriteError as e:
+            # Duplicate _id rejects are records that already reached MongoDB before the spill
+            details = e.details or {}
+            rejected = {err.get("index") for err in details.get("writeErrors", [])}
+            self.replayed += details.get("nInserted", 0)
+            self._notify([r for i, r in enumerate(records) if i not in rejected])
+            print(f"INFO: Replayed {details.get('nInserted', 0)} spilled diagnostic log(s); {len(rejected)} already stored.")
+        except Exception as e:
+            # Still offline: put the records back for the next attempt
+            print(f"WARN: Spill replay failed: {e}")
+            self._spill(records, count=False)
+        os.remove(replay_path)
+
+    def close(self, timeout=10):
+        """Flushes everything still queued; called on application shutdown."""
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            print("WARN: Log sink queue still full at shutdown; not waiting for the flusher.")
+            return
+        self._worker.join(timeout=timeout)
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "failed_flushes": self.failed_flushes,
+        }
@@ -1,41 +1,78 @@
 import sys
 import os
-from fastapi import FastAPI, HTTPException
+import time
+
+# Directory path configurations
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.append(current_dir)
+
+# Startup subsystem: heavy optional SDKs are only imported on first use
+from startup import StartupManager, lazy_module, timed_import, record_import_time
+_top_level_imports_started = time.perf_counter()
+
+# Eager third-party imports (ours and those of the local modules below) go through
+# timed_import first so /readyz attributes import cost per library; the plain import
+# statements that follow then hit sys.modules.
+for _module_name in ("fastapi", "pydantic", "numpy", "joblib", "pymongo", "bson", "dotenv", "bcrypt", "thefuzz"):
+    timed_import(_module_name)
+
+from fastapi import FastAPI, HTTPException, Request, Response, Depends, Header
 from pydantic import BaseModel
+from typing import List, Optional
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 import joblib
-import pandas as pd
 import numpy as np
 import json
 import ssl
-from datetime import datetime
+from datetime import datetime, timedelta
 from pymongo import MongoClient
-import bcrypt
+from pymongo.errors import DuplicateKeyError
 from dotenv import load_dotenv
-import razorpay
-import shap 
-from thefuzz import process
-import google.generativeai as genai 
-import itertools
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 
-# Directory path configurations
-current_dir = os.path.dirname(os.path.abspath(__file__))
-if current_dir not in sys.path:
-    sys.path.append(current_dir)
+genai = lazy_module("google.generativeai")
+razorpay = lazy_module("razorpay")
 
 # Initialize Primary Clinical Interceptor
 try:
-    from clinical_rules import get_heuristic_diagnosis
+    from clinical_rules import get_heuristic_diagnosis, COMMON_CASES
     print("INFO: Primary Clinical Interceptor loaded successfully.")
 except ImportError as e:
     print(f"WARN: Primary Interceptor unavailable. Operating on strict ML pipeline. Error: {e}")
     def get_heuristic_diagnosis(syms): return None
-
-# Initialize NLP Pipeline
+    COMMON_CASES = []
+
+from cache_utils import LRUCache
+from class_index import ClassIndex
+from feature_space import FeatureVectorizer, strip_feature_names
+from inference_dispatcher import InferenceDispatcher
+from followup import FollowUpSelector
+from log_sink import DiagnosticLogSink
+import admin_queries
+from analytics import AnalyticsRollups
+from catalog_cache import CatalogCache, etag_matches
+from kb_manager import KBManager
+from profile_jobs import ProfileJobQueue, LocalStubGenerator, InvalidProfileData, validate_biometrics, FALLBACK_PROFILE, STATUS_PENDING, STATUS_FALLBACK
+from llm_cache import LLMCache, LLMClient, StubLLMBackend, bucket_biometrics
+from db_indexes import ensure_indexes
+from metrics import REGISTRY, PREDICT_STAGE_SECONDS, PREDICT_PATH_TOTAL, AUTH_SECONDS, PAYMENT_SECONDS
+from auth import AuthExecutor, AuthOverloaded, InvalidToken, SessionTokens
+
+# Initialize XAI Explanation Engine
 try:
-    from app.symptom_nlp import extract_and_map_symptoms
-except ImportError:
-    def extract_and_map_symptoms(text): return [], "medium"
+    from explain_engine import ExplanationEngine
+except ImportError as e:
+    print(f"WARN: SHAP explainability unavailable. Error: {e}")
+    ExplanationEngine = None
+
+record_import_time("main (all top-level imports)", time.perf_counter() - _top_level_imports_started)
+
+# NLP Pipeline placeholders until load_nlp_pipeline() runs in the background
+def extract_and_map_symptoms(text): return [], "medium"
+def extract_and_map_symptoms_batch(texts): return [extract_and_map_symptoms(t) for t in texts]
 
 load_dotenv() 
 
@@ -88,122 +125,488 @@ try:
     logs_collection = db["diagnostic_logs"] 
     orders_collection = db["orders"]        
     inventory_collection = db["pharmacy_products_final"]
+    analytics = AnalyticsRollups(db["analytics_rollups"])
+    catalog_cache = CatalogCache(inventory_collection, db["store_meta"], check_interval=float(os.getenv("CATALOG_CHECK_INTERVAL", "5")))
     print("INFO: Connected to MongoDB Atlas Cluster.")
 except Exception as e:
     print(f"ERROR: MongoDB Connection Failed: {e}")
+    db = logs_collection = analytics = catalog_cache = None
+
+# Diagnostic logs are written off the request thread; spills land here while Mongo is down.
+# Every flushed batch is also folded into the admin analytics rollups.
+log_sink = DiagnosticLogSink.from_env(
+    logs_collection,
+    os.path.join(current_dir, "../logs/diagnostic_logs.spill.jsonl"),
+    on_flush=analytics.record_diagnoses if analytics else None,
+)
+EMERGENCY_LOG_SYNC_ACK = os.getenv("EMERGENCY_LOG_SYNC_ACK", "1") != "0"
 
-try:
-    print("INFO: Loading Multi-Model Ensemble Engine...")
-    model = joblib.load(os.path.join(current_dir, "../models/ensemble_model.pkl"))
-    xgb_base = joblib.load(os.path.join(current_dir, "../models/xgboost_base_model.pkl"))
-    le = joblib.load(os.path.join(current_dir, "../models/label_encoder.pkl"))
-    symptoms_list = joblib.load(os.path.join(current_dir, "../models/symptoms_list.pkl"))
-    critical_diseases = joblib.load(os.path.join(current_dir, "../models/critical_diseases.pkl"))
-    print("INFO: ML Artifacts and Security Protocols Loaded.")
-except Exception as e: 
-    print(f"ERROR: ML Artifact Load Failure: {e}")
-    critical_diseases = ['Heart attack', 'Paralysis (brain hemorrhage)']
-    model = xgb_base = le = None
-    symptoms_list = [] 
-
-def _normalize_list(value):
-    if isinstance(value, str):
-        return [value.strip().lower()]
-    if isinstance(value, list):
-        return [str(v).strip().lower() for v in value if str(v).strip()]
-    return []
-
-# YOUR CUSTOM DB BUILDER
-def _build_db_from_medicine_master(master_data):
-    ages = ["young", "middle", "elder"]
-    genders = ["male", "female"]
-    severities = ["low", "medium", "high"]
-    structured = {}
-
-    for disease, medicines in master_data.items():
-        disease_key = str(disease).strip()
-        if not disease_key or not isinstance(medicines, list):
-            continue
-        disease_bucket = {}
-
-        for age, gender, severity in itertools.product(ages, genders, severities):
-            combo_key = f"{age}_{gender}_{severity}"
-            candidates = []
-            for med in medicines:
-                if not isinstance(med, dict):
-                    continue
-
-                allowed_ages = _normalize_list(med.get("allowed_ages", ["all"]))
-                allowed_genders = _normalize_list(med.get("allowed_genders", ["all"]))
-                allowed_severities = _normalize_list(med.get("allowed_severities", ["low", "medium", "high"]))
-
-                age_ok = "all" in allowed_ages or age in allowed_ages
-                gender_ok = "all" in allowed_genders or gender in allowed_genders
-                severity_ok = "all" in allowed_severities or severity in allowed_severities
-                if not (age_ok and gender_ok and severity_ok):
-                    continue
-
-                candidates.append(
-                    {
-                        "medicine_name": med.get("medicine_name", "Ayurvedic Protocol"),
-                        "dosage": med.get("dosage", "Standard Dose"),
-                        "formulation_type": med.get("formulation_type", "classical"),
-                        "dosha_type": med.get("dosha_type", "tridosha"),
-                        "herb_sanskrit": med.get("herb_sanskrit", []),
-                    }
-                )
-            disease_bucket[combo_key] = candidates
-        structured[disease_key] = disease_bucket
-    return structured
+MODELS_DIR = os.path.join(current_dir, "../models")
+ML_ARTIFACT_FILES = ["ensemble_model.pkl", "xgboost_base_model.pkl", "label_encoder.pkl", "symptoms_list.pkl", "critical_diseases.pkl"]
+
+# Ensemble results per (sorted symptoms, is_final_check, model version); cleared on every artifact (re)load
+prediction_cache = LRUCache(
+    maxsize=int(os.getenv("PREDICTION_CACHE_SIZE", "4096")),
+    ttl_seconds=float(os.getenv("PREDICTION_CACHE_TTL", "600")),
+)
+
+def _artifact_version():
+    fingerprint = hashlib.sha1()
+    for name in ML_ARTIFACT_FILES:
+        path = os.path.join(MODELS_DIR, name)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            fingerprint.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return fingerprint.hexdigest()[:12]
+
+# Populated by load_ml_artifacts() on the startup thread
+model = xgb_base = le = None
+symptoms_list = []
+critical_diseases = ['Heart attack', 'Paralysis (brain hemorrhage)']
+vectorizer = class_index = explanation_engine = inference_dispatcher = followup_selector = None
+MODEL_VERSION = None
+TRAINING_CSV = os.path.join(current_dir, "..", "data", "Training.csv")
+
+def load_ml_artifacts():
+    global model, xgb_base, le, symptoms_list, critical_diseases
+    global vectorizer, class_index, explanation_engine, inference_dispatcher, followup_selector, MODEL_VERSION
 
-try:
-    kb_path = os.path.join(current_dir, "../ayurveda_pipeline/output/ayurveda_kb_structured.json")
-    with open(kb_path, "r", encoding="utf-8") as f:
-        ayurveda_db = json.load(f)
-    print("INFO: Ayurveda Medical Ontology Indexed from output KB.")
-except Exception:
     try:
-        master_path = os.path.join(current_dir, "../ayurveda_pipeline/medicine_master.json")
-        with open(master_path, "r", encoding="utf-8") as f:
-            master_data = json.load(f)
-        ayurveda_db = _build_db_from_medicine_master(master_data)
-        print("INFO: Ayurveda protocol loaded from medicine_master.json.")
-    except Exception as e:
-        print(f"WARN: Ayurveda KB unavailable: {e}")
-        ayurveda_db = {}
+        print("INFO: Loading Multi-Model Ensemble Engine...")
+        # The five pickles are independent, so unpickle them concurrently
+        with ThreadPoolExecutor(max_workers=len(ML_ARTIFACT_FILES), thread_name_prefix="artifact") as pool:
+            loaded = list(pool.map(lambda name: joblib.load(os.path.join(MODELS_DIR, name)), ML_ARTIFACT_FILES))
+        new_model, new_xgb_base, new_le, new_symptoms_list, new_critical_diseases = loaded
+        print("INFO: ML Artifacts and Security Protocols Loaded.")
+    except Exception as e: 
+        # Nothing is swapped: startup fails the task, a reload keeps serving the previous artifacts
+        print(f"ERROR: ML Artifact Load Failure: {e}")
+        raise RuntimeError(f"ML artifact load failed: {e}") from e
+
+    # Resolve the model's column layout once instead of per request
+    new_vectorizer = FeatureVectorizer(new_model, new_symptoms_list) if new_model is not None else None
+    if new_model is not None:
+        # Column order verified once here; requests then pass plain ndarrays
+        strip_feature_names(new_model, new_vectorizer.expected_features)
+
+    # Decode labels and flag critical classes once; misconfigured critical names are reported here
+    new_class_index = None
+    if new_model is not None:
+        new_class_index = ClassIndex(new_model, new_le, new_critical_diseases)
+        new_class_index.report()
+
+    # Build the SHAP explainer once; per-request construction dominated /predict p99
+    new_engine = None
+    if new_xgb_base is not None and ExplanationEngine is not None:
+        try:
+            new_engine = ExplanationEngine(new_xgb_base, new_vectorizer.expected_features)
+            print("INFO: SHAP Explanation Engine Ready.")
+        except Exception as e:
+            print(f"WARN: SHAP Explanation Engine unavailable: {e}")
+
+    # Coalesce concurrent /predict rows into one batched predict_proba + SHAP call
+    new_dispatcher = None
+    if new_model is not None and os.getenv("INFERENCE_BATCHING", "1") != "0":
+        new_dispatcher = InferenceDispatcher.from_env(new_model, new_vectorizer, new_engine)
+        print(f"INFO: Micro-batching Inference Dispatcher Ready (window={new_dispatcher.window_s * 1000:.1f}ms, max_batch={new_dispatcher.max_batch}).")
+
+    # Follow-up questions ranked by expected information gain over the model's posterior
+    new_followup = None
+    if new_model is not None:
+        new_followup = FollowUpSelector(new_model, new_vectorizer, new_class_index.class_names, new_symptoms_list,
+                                        training_csv=TRAINING_CSV if os.path.exists(TRAINING_CSV) else None)
+
+    old_dispatcher = inference_dispatcher
+    model, xgb_base, le, symptoms_list, critical_diseases = new_model, new_xgb_base, new_le, new_symptoms_list, new_critical_diseases
+    vectorizer, class_index, explanation_engine, inference_dispatcher = new_vectorizer, new_class_index, new_engine, new_dispatcher
+    followup_selector = new_followup
+    MODEL_VERSION = _artifact_version()
+    prediction_cache.clear()
+    if old_dispatcher:
+        old_dispatcher.close()
+    print(f"INFO: Model version {MODEL_VERSION} active.")
+    kb_manager.rebuild_aliases()
+
+def _diagnosis_names():
+    """Every diagnosis the API can emit: heuristic rule outputs + model classes."""
+    names = {disease for _, disease in COMMON_CASES}
+    if class_index is not None:
+        names.update(class_index.class_names)
+    return names
+
+# Versioned, hot-reloadable KB; requests read kb_manager.current once per response
+kb_manager = KBManager(
+    os.path.join(current_dir, "../ayurveda_pipeline/output/ayurveda_kb_structured.json"),
+    os.path.join(current_dir, "../ayurveda_pipeline/medicine_master.json"),
+    disease_names=_diagnosis_names,
+)
+
+def load_ayurveda_kb():
+    kb_manager.load()
+    kb_manager.start_watcher(float(os.getenv("KB_WATCH_INTERVAL", "10")))
+
+def load_nlp_pipeline():
+    global extract_and_map_symptoms, extract_and_map_symptoms_batch
+    # Any failure (missing spaCy model, stale NLP artifact, ...) fails this required task;
+    # the placeholders above would answer every complaint with "no symptoms"
+    nlp_module = timed_import("app.symptom_nlp")
+    extract_and_map_symptoms = nlp_module.extract_and_map_symptoms
+    extract_and_map_symptoms_batch = nlp_module.extract_and_map_symptoms_batch
 
 # ==========================================
 # GENERATIVE AI PROFILING CONFIGURATION
 # ==========================================
-try:
-    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-    gemini_model = genai.GenerativeModel('gemini-1.5-flash')
-    print("INFO: Generative Profiling API Ready.")
-except Exception as e:
-    gemini_model = None
+PROFILE_MODEL_NAME = "gemini-1.5-flash"
+gemini_model = None
+
+def _get_gemini_model():
+    global gemini_model
+    if gemini_model is None:
+        try:
+            genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+            gemini_model = genai.GenerativeModel(PROFILE_MODEL_NAME)
+            print("INFO: Generative Profiling API Ready.")
+        except Exception as e:
+            print(f"WARN: Generative Profiling API unavailable: {e}")
+    return gemini_model
+
+def _gemini_backend(prompt, timeout=None):
+    gemini = _get_gemini_model()
+    if gemini is None:
+        raise RuntimeError("Generative Profiling API not configured")
+    response = gemini.generate_content(prompt, request_options={"timeout": timeout} if timeout else None)
+    return response.text
+
+# Disk-backed prompt cache shared by every worker on this host (LLM_CACHE / LLM_BACKEND)
+llm_cache = LLMCache.from_env(os.path.join(current_dir, "..", "cache", "llm_cache.sqlite3"))
+profile_llm = LLMClient(
+    StubLLMBackend() if os.getenv("LLM_BACKEND") == "stub" else _gemini_backend,
+    llm_cache,
+    PROFILE_MODEL_NAME,
+)
 
-def generate_ayurvedic_profile(user_data: UserRegister):
-    height_m = user_data.height / 100.0
-    bmi = round(user_data.weight / (height_m ** 2), 1)
-    prompt = f"Expert Ayurvedic doctor. Profile: {user_data.dict()}, BMI: {bmi}. Respond STRICTLY with a JSON object."
+def _parse_profile_json(raw_text):
+    raw_text = raw_text.strip()
+    if "{" in raw_text:
+        raw_text = raw_text[raw_text.find("{"):raw_text.rfind("}")+1]
+    return json.loads(raw_text)
+
+def generate_ayurvedic_profile(profile_data: dict, timeout=None):
+    """Single Gemini attempt; raises on any failure so the job queue can retry (or fall back on bad input)."""
+    validate_biometrics(profile_data)
+    # Bucketed biometrics: near-identical users produce the same prompt and share a cached profile
+    bucketed = bucket_biometrics(profile_data)
+    height_m = bucketed["height"] / 100.0
+    bmi = round(bucketed["weight"] / (height_m ** 2), 1)
+    prompt = f"Expert Ayurvedic doctor. Profile: {bucketed}, BMI: {bmi}. Respond STRICTLY with a JSON object."
+    return _parse_profile_json(profile_llm.generate(prompt, timeout=timeout, validate=_parse_profile_json))
+
+def _store_profile(username, profile, status):
+    users_collection.update_one({"name": username}, {"$set": {"ayurvedic_profile": profile, "profile_status": status}})
+    print(f"INFO: Ayurvedic profile for '{username}' stored ({status}).")
+
+# Jobs cancelled by a shutdown leave users "pending"; a pending user whose claim is older
+# than this is picked up again when a worker starts (claims keep workers from doubling up)
+PROFILE_JOB_RESUME_AFTER = timedelta(seconds=float(os.getenv("PROFILE_JOB_RESUME_AFTER", "300")))
+
+def _resume_pending_profiles():
+    stale = {"profile_status": STATUS_PENDING, "$or": [
+        {"profile_claimed_at": {"$exists": False}},
+        {"profile_claimed_at": {"$lt": datetime.now() - PROFILE_JOB_RESUME_AFTER}},
+    ]}
+    hidden = {"_id": 0, "password": 0, "ayurvedic_profile": 0, "profile_status": 0, "profile_claimed_at": 0}
+    resumed = fallbacks = 0
+    # Claiming moves the user out of `stale`, so every pending user is taken exactly once
+    while True:
+        user = users_collection.find_one_and_update(stale, {"$set": {"profile_claimed_at": datetime.now()}}, projection=hidden)
+        if user is None:
+            break
+        if profile_jobs.enqueue(user["name"], user):
+            resumed += 1
+        else:
+            _store_profile(user["name"], dict(FALLBACK_PROFILE), STATUS_FALLBACK)
+            fallbacks += 1
+    if resumed or fallbacks:
+        print(f"INFO: Resumed {resumed} pending profile job(s); {fallbacks} got the fallback profile (queue full).")
+
+# PROFILE_GENERATOR=stub swaps Gemini for a deterministic local generator (tests / offline dev)
+profile_jobs = ProfileJobQueue(
+    LocalStubGenerator() if os.getenv("PROFILE_GENERATOR") == "stub" else generate_ayurvedic_profile,
+    _store_profile,
+    max_workers=int(os.getenv("PROFILE_JOB_WORKERS", "4")),
+    max_pending=int(os.getenv("PROFILE_JOB_MAX_PENDING", "256")),
+    timeout=float(os.getenv("PROFILE_JOB_TIMEOUT", "20")),
+    max_retries=int(os.getenv("PROFILE_JOB_RETRIES", "3")),
+)
+
+# ==========================================
+# STARTUP, READINESS & WARM-UP
+# ==========================================
+WARMUP_COMPLAINTS = [
+    "I have a terrible headache and high fever since yesterday",
+    "mild stomach pain with nausea and vomiting",
+    "itching all over with a skin rash",
+    "cough, chest pain and I feel short of breath",
+]
+
+def _warmup_predictions():
+    count = int(os.getenv("WARMUP_PREDICTIONS", "8"))
+    if model is None or count <= 0:
+        return
+    for text in WARMUP_COMPLAINTS:
+        extract_and_map_symptoms(text)
+
+    rng = np.random.default_rng(0)
+    features = vectorizer.expected_features
+    symptom_sets = [list(rng.choice(features, size=min(3, len(features)), replace=False)) for _ in range(count)]
+    if inference_dispatcher:
+        futures = [inference_dispatcher.submit(symptoms) for symptoms in symptom_sets]
+        rows = [future.result(timeout=60) for future in futures]
+    else:
+        rows = model.predict_proba(vectorizer.matrix([vectorizer.indices(s) for s in symptom_sets]))
+    for symptoms, row in zip(symptom_sets, rows):
+        for final_check in (False, True):
+            top_position, _, _ = _rank_probabilities(row, final_check)
+            if explanation_engine:
+                explanation_engine.explain(None, symptoms, top_position)
+    print(f"INFO: Warm-up completed with {count} synthetic predictions.")
+
+    # Pre-rank follow-ups for the single symptoms the clinical rules are built on
+    if followup_selector and os.getenv("FOLLOWUP_WARMUP", "1") != "0":
+        seeds = sorted({s for rule_syms, _ in COMMON_CASES for s in rule_syms if s in vectorizer.column_index})
+        for symptom in seeds:
+            followup_selector.suggest([symptom], k=4)
+        print(f"INFO: Follow-up suggestions pre-ranked for {len(seeds)} common symptoms.")
+
+startup_manager = StartupManager()
+startup_manager.add_task("ml_artifacts", load_ml_artifacts)
+startup_manager.add_task("ayurveda_kb", load_ayurveda_kb)
+startup_manager.add_task("nlp_pipeline", load_nlp_pipeline)
+if db is not None:
+    startup_manager.add_task("db_indexes", lambda: ensure_indexes(db), required=False)
+    startup_manager.add_task("profile_jobs", _resume_pending_profiles, required=False)
+startup_manager.set_warmup(_warmup_predictions)
+
+@app.on_event("startup")
+def start_background_loading():
+    # STARTUP_BACKGROUND=0 blocks the worker until it is ready (handy for scripts)
+    startup_manager.start(background=os.getenv("STARTUP_BACKGROUND", "1") != "0")
+
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    if not startup_manager.ready:
+        return JSONResponse(status_code=503, content=startup_manager.report())
+    return {"status": "ready", "model_version": MODEL_VERSION, "kb_version": kb_manager.current.version}
+
+@app.get("/admin/startup-report")
+def get_startup_report():
+    return startup_manager.report()
+
+def _require_ready():
+    if startup_manager.failed:
+        raise HTTPException(status_code=503, detail={
+            "message": "Diagnosis engine failed to start.",
+            "task_errors": dict(startup_manager.task_errors),
+            "warmup_error": startup_manager.warmup_error,
+        })
+    if not startup_manager.ready:
+        raise HTTPException(status_code=503, detail="Diagnosis engine is still starting up. Please retry shortly.")
+
+@app.on_event("shutdown")
+def shutdown_inference():
+    if inference_dispatcher:
+        inference_dispatcher.close()
+    log_sink.close()
+    kb_manager.stop_watcher()
+    profile_jobs.shutdown()
+    auth_executor.shutdown()
+
+@app.post("/admin/reload-models")
+def reload_models():
     try:
-        response = gemini_model.generate_content(prompt)
-        raw_text = response.text.strip()
-        if "{" in raw_text:
-            raw_text = raw_text[raw_text.find("{"):raw_text.rfind("}")+1]
-        return json.loads(raw_text)
-    except:
-        return {"dosha": "Vata-Kapha", "description": "Fallback profile generated."}
+        load_ml_artifacts()
+    except RuntimeError as e:
+        return {"status": "error", "detail": str(e), "model_version": MODEL_VERSION}
+    return {"status": "success", "model_version": MODEL_VERSION}
+
+@app.post("/admin/reload-kb")
+def reload_kb():
+    previous = kb_manager.current.version
+    snapshot = kb_manager.load()
+    return {"status": "success", "kb_version": snapshot.version, "changed": snapshot.version != previous}
+
+@app.get("/admin/inference-stats")
+def get_inference_stats():
+    return {
+        "model_version": MODEL_VERSION,
+        "kb": kb_manager.stats(),
+        "prediction_cache": prediction_cache.stats(),
+        "log_sink": log_sink.stats(),
+        "profile_jobs": profile_jobs.stats(),
+        "llm_cache": profile_llm.stats(),
+        "auth": auth_executor.stats(),
+        "dispatcher": inference_dispatcher.stats() if inference_dispatcher else None,
+        "shap": explanation_engine.stats() if explanation_engine else None,
+        "followup": followup_selector.stats() if followup_selector else None,
+    }
+
+# Existing component stats are exported as gauges next to the per-stage histograms
+REGISTRY.register_stats("prediction_cache", prediction_cache.stats)
+REGISTRY.register_stats("inference_dispatcher", lambda: inference_dispatcher.stats() if inference_dispatcher else None)
+REGISTRY.register_stats("shap_engine", lambda: explanation_engine.stats() if explanation_engine else None)
+REGISTRY.register_stats("followup", lambda: followup_selector.stats() if followup_selector else None)
+REGISTRY.register_stats("log_sink", log_sink.stats)
+REGISTRY.register_stats("kb", kb_manager.stats)
+REGISTRY.register_stats("profile_jobs", lambda: profile_jobs.stats())
+REGISTRY.register_stats("llm_cache", lambda: profile_llm.stats())
+REGISTRY.register_stats("auth_executor", lambda: auth_executor.stats())
+
+@app.get("/metrics")
+def get_metrics():
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/medicines")
-def get_all_medicines():
-    return {"products": list(inventory_collection.find({}, {"_id": 0}))}
+def get_all_medicines(request: Request):
+    snapshot = catalog_cache.current()
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    if "gzip" in request.headers.get("accept-encoding", "").lower():
+        return Response(content=snapshot.gzip_body, media_type="application/json", headers={**headers, "Content-Encoding": "gzip"})
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
 
 # ==========================================
 # AI DIAGNOSTIC ENDPOINT
 # ==========================================
+PREDICT_BATCH_MAX = int(os.getenv("PREDICT_BATCH_MAX", "1000"))
+
+def _no_symptom_response(data: UserInput):
+    if data.is_final_check:
+        return {"status": "error", "message": "Without any recognized symptoms, I cannot safely provide a diagnosis. Please try describing your condition using specific medical terms."}
+    
+    fallback_pool = ["headache", "high_fever", "stomach_pain", "fatigue", "nausea", "chills", "cough"]
+    suggestions = [s for s in fallback_pool if s in symptoms_list]
+    if len(suggestions) < 4 and len(symptoms_list) > 0:
+        extra = [s for s in symptoms_list if s not in suggestions]
+        suggestions.extend(extra[:4 - len(suggestions)])
+        
+    return {
+        "status": "needs_more_info",
+        "message": "I didn't quite catch any specific medical symptoms from your description. To help me diagnose you, are you experiencing any of these common issues?",
+        "follow_up_symptoms": suggestions[:5],
+        "extracted_symptoms": [],
+        "current_top_prediction": "Unknown",
+        "confidence": 0.0
+    }
+
+def _rank_probabilities(raw_probabilities, is_final_check):
+    """Phase 2 post-processing: returns (top_position, top_disease, confidence)."""
+    temp = 1.00 
+    scaled_probs = np.exp(raw_probabilities / temp) / np.sum(np.exp(raw_probabilities / temp))
+    
+    if is_final_check:
+        scaled_probs = scaled_probs * class_index.non_critical_weights
+
+    top_position = int(np.argmax(scaled_probs))
+    top_disease = class_index.decode(top_position)
+    
+    if is_final_check:
+        confidence = scaled_probs[top_position] / (np.sum(scaled_probs) + 1e-9)
+    else:
+        confidence = scaled_probs[top_position]
+    return top_position, top_disease, confidence
+
+def _build_treatment_plan(data: UserInput, top_disease, kb):
+    """Phase 4: returns (pregnancy_status, ayurveda_protocol) for the diagnosed disease from one KB snapshot."""
+    with PREDICT_STAGE_SECONDS.time("kb_mapping"):
+        kb_key = kb.resolver.resolve(top_disease)
+        return kb.prescription_table.lookup(kb_key, data.age_category, data.gender, data.severity, data.is_pregnant)
+
+def _finalize_diagnosis(data: UserInput, clean_text, valid_symptoms, top_disease, confidence, feature_contributions):
+    """
+    Phases 3-4 shared by /predict and /predict/batch.
+    Returns (response, log_record); log_record is None when nothing should be logged.
+    """
+    # Phase 3: Clinical Safety & Doctor Clarification Routing
+    if not data.is_final_check:
+        if top_disease in critical_diseases and len(valid_symptoms) < 3:
+            return {
+                "status": "needs_more_info",
+                "message": f"A {valid_symptoms[0].replace('_', ' ')} can be caused by many things. To ensure your safety, are you also feeling any dizziness, blurred vision, or sudden weakness?",
+                "extracted_symptoms": valid_symptoms,
+                "current_top_prediction": top_disease,
+                "confidence": round(float(confidence * 100), 2),
+                "follow_up_symptoms": ["dizziness", "blurred_vision", "unsteadiness", "stiff_neck"]
+            }, None
+        elif len(valid_symptoms) < 3:
+            suggestions = []
+            if followup_selector:
+                try:
+                    with PREDICT_STAGE_SECONDS.time("followup"):
+                        suggestions = followup_selector.suggest(valid_symptoms, k=4)
+                except Exception as e:
+                    print(f"WARN: Follow-up selection failed, using the default pool: {e}")
+            if not suggestions:
+                fallback_pool = ["headache", "fatigue", "nausea", "chills", "sweating", "stomach_pain", "cough"]
+                suggestions = [s for s in fallback_pool if s in symptoms_list and s not in valid_symptoms]
+                if len(suggestions) < 4 and len(symptoms_list) > 0:
+                    extra = [s for s in symptoms_list if s not in valid_symptoms and s not in suggestions]
+                    suggestions.extend(extra[:4 - len(suggestions)])
+            symptom_str = ", ".join([s.replace("_", " ") for s in valid_symptoms])
+            
+            return {
+                "status": "needs_more_info",
+                "message": f"You mentioned {symptom_str}. That is a good start, but many conditions share these early signs. To help me narrow down the diagnosis, are you also feeling any of these?",
+                "follow_up_symptoms": suggestions[:4],
+                "extracted_symptoms": valid_symptoms,
+                "current_top_prediction": top_disease,
+                "confidence": round(float(confidence * 100), 2)
+            }, None
+
+    # Emergency Final Warning
+    if top_disease in critical_diseases and confidence > 0.40:
+        return {
+            "status": "CRITICAL",
+            "diagnosis": top_disease,
+            "confidence": round(float(confidence * 100), 2),
+            "message": f"EMERGENCY: Symptoms indicate {top_disease}. Seek immediate hospital care."
+        }, {"username": data.username, "symptoms": clean_text, "predicted_disease": top_disease, "status": "EMERGENCY", "timestamp": datetime.now()}
+
+    log_record = {"username": data.username, "symptoms": clean_text, "predicted_disease": top_disease, "status": "COMPLETED", "timestamp": datetime.now()}
+
+    # Phase 4: Treatment Ontology Mapping
+    kb = kb_manager.current
+    preg_warning, ayurveda_protocol_list = _build_treatment_plan(data, top_disease, kb)
+
+    return {
+        "status": "success",
+        "diagnosis": top_disease,
+        "confidence": round(float(confidence * 100), 2),
+        "extracted_symptoms": valid_symptoms,
+        "detected_severity": data.severity,
+        "prescription": {"pregnancy_status": preg_warning},
+        "ayurveda_protocol": ayurveda_protocol_list, 
+        "shap_explainability": feature_contributions,
+        "kb_version": kb.version
+    }, log_record
+
+def _crash_response(e):
+    import traceback
+    print("\n❌ CRITICAL BACKEND CRASH DETECTED ❌")
+    traceback.print_exc() 
+    return {"status": "error", "message": f"Backend Error: {str(e)}"}
+
 @app.post("/predict")
 def predict_disease(data: UserInput):
+    _require_ready()
+    with PREDICT_STAGE_SECONDS.time("total"):
+        return _predict_disease(data)
+
+def _predict_disease(data: UserInput):
     try:
         if not model: 
             return {"error": "Model not loaded"}
@@ -211,250 +614,232 @@ def predict_disease(data: UserInput):
         force_skip = "skip_followup" in data.text.lower()
         clean_text = data.text.replace("skip_followup.", "").strip()
 
-        valid_symptoms, detected_severity = extract_and_map_symptoms(clean_text)
+        with PREDICT_STAGE_SECONDS.time("nlp"):
+            valid_symptoms, detected_severity = extract_and_map_symptoms(clean_text)
         
         if not valid_symptoms:
-            if data.is_final_check:
-                return {"status": "error", "message": "Without any recognized symptoms, I cannot safely provide a diagnosis. Please try describing your condition using specific medical terms."}
-            
-            fallback_pool = ["headache", "high_fever", "stomach_pain", "fatigue", "nausea", "chills", "cough"]
-            suggestions = [s for s in fallback_pool if s in symptoms_list]
-            if len(suggestions) < 4 and len(symptoms_list) > 0:
-                extra = [s for s in symptoms_list if s not in suggestions]
-                suggestions.extend(extra[:4 - len(suggestions)])
-                
-            return {
-                "status": "needs_more_info",
-                "message": "I didn't quite catch any specific medical symptoms from your description. To help me diagnose you, are you experiencing any of these common issues?",
-                "follow_up_symptoms": suggestions[:5],
-                "extracted_symptoms": [],
-                "current_top_prediction": "Unknown",
-                "confidence": 0.0
-            }
+            PREDICT_PATH_TOTAL.inc("no_symptoms")
+            return _no_symptom_response(data)
 
         # Phase 1: Fast-Track Clinical Interceptor
-        top_disease = get_heuristic_diagnosis(valid_symptoms)
+        with PREDICT_STAGE_SECONDS.time("heuristic"):
+            top_disease = get_heuristic_diagnosis(valid_symptoms)
         feature_contributions = []
         
         if top_disease:
             print(f"INFO: High-confidence primary match established: {top_disease}")
+            PREDICT_PATH_TOTAL.inc("heuristic")
             confidence = 0.98 
             
         else:
             # Phase 2: Probabilistic Ensemble Inference
             print("INFO: Initiating Deep-Feature Ensemble ML Analysis...")
             
-            if hasattr(model, 'feature_names_in_'):
-                expected_features = list(model.feature_names_in_)
-            else:
-                expected_features = symptoms_list
-
-            input_dict = {sym: 0 for sym in expected_features}
-            for symptom in valid_symptoms:
-                if symptom in input_dict:
-                    input_dict[symptom] = 1
-                    
-            input_df = pd.DataFrame([input_dict], columns=expected_features)
-            raw_probabilities = model.predict_proba(input_df)[0]
-            temp = 1.00 
-            scaled_probs = np.exp(raw_probabilities / temp) / np.sum(np.exp(raw_probabilities / temp))
-            
-            if data.is_final_check:
-                for idx, cls_label in enumerate(model.classes_):
-                    decoded_name = le.inverse_transform([cls_label])[0]
-                    if decoded_name in critical_diseases:
-                        scaled_probs[idx] = 0.0 
-
-            top_position = int(np.argmax(scaled_probs))
-            actual_class_label = model.classes_[top_position]
-            top_disease = le.inverse_transform([actual_class_label])[0]
-            
-            if data.is_final_check:
-                confidence = scaled_probs[top_position] / (np.sum(scaled_probs) + 1e-9)
-            else:
-                confidence = scaled_probs[top_position]
-
-            # XAI Feature Impact Calculation (SHAP)
-            if xgb_base:
-                try:
-                    explainer = shap.TreeExplainer(xgb_base)
-                    shap_values = explainer.shap_values(input_df)
-                    impact_array = shap_values[top_position][0] if isinstance(shap_values, list) else shap_values[0]
-                    for i, feature in enumerate(expected_features):
-                        if input_df[feature].iloc[0] == 1:
-                            feature_contributions.append({
-                                "symptom": feature.replace('_', ' ').title(),
-                                "impact_score": round(float(impact_array[i]), 4)
-                            })
-                    feature_contributions = sorted(feature_contributions, key=lambda x: x['impact_score'], reverse=True)
-                except: pass
-
-        # Phase 3: Clinical Safety & Doctor Clarification Routing
-        if not data.is_final_check:
-            if top_disease in critical_diseases and len(valid_symptoms) < 3:
-                return {
-                    "status": "needs_more_info",
-                    "message": f"A {valid_symptoms[0].replace('_', ' ')} can be caused by many things. To ensure your safety, are you also feeling any dizziness, blurred vision, or sudden weakness?",
-                    "extracted_symptoms": valid_symptoms,
-                    "current_top_prediction": top_disease,
-                    "confidence": round(float(confidence * 100), 2),
-                    "follow_up_symptoms": ["dizziness", "blurred_vision", "unsteadiness", "stiff_neck"]
-                }
-            elif len(valid_symptoms) < 3:
-                fallback_pool = ["headache", "fatigue", "nausea", "chills", "sweating", "stomach_pain", "cough"]
-                suggestions = [s for s in fallback_pool if s in symptoms_list and s not in valid_symptoms]
-                if len(suggestions) < 4 and len(symptoms_list) > 0:
-                    extra = [s for s in symptoms_list if s not in valid_symptoms and s not in suggestions]
-                    suggestions.extend(extra[:4 - len(suggestions)])
-                symptom_str = ", ".join([s.replace("_", " ") for s in valid_symptoms])
-                
-                return {
-                    "status": "needs_more_info",
-                    "message": f"You mentioned {symptom_str}. That is a good start, but many conditions share these early signs. To help me narrow down the diagnosis, are you also feeling any of these?",
-                    "follow_up_symptoms": suggestions[:4],
-                    "extracted_symptoms": valid_symptoms,
-                    "current_top_prediction": top_disease,
-                    "confidence": round(float(confidence * 100), 2)
-                }
-
-        # Emergency Final Warning
-        if top_disease in critical_diseases and confidence > 0.40:
-            logs_collection.insert_one({"username": data.username, "symptoms": clean_text, "predicted_disease": top_disease, "status": "EMERGENCY", "timestamp": datetime.now()})
-            return {
-                "status": "CRITICAL",
-                "diagnosis": top_disease,
-                "confidence": round(float(confidence * 100), 2),
-                "message": f"EMERGENCY: Symptoms indicate {top_disease}. Seek immediate hospital care."
-            }
-
-        logs_collection.insert_one({"username": data.username, "symptoms": clean_text, "predicted_disease": top_disease, "status": "COMPLETED", "timestamp": datetime.now()})
-
-        # Phase 4: Treatment Ontology Mapping
-        db_keys = list(ayurveda_db.keys())
-        disease_data = {}
-        if db_keys:
-            best_match, score = process.extractOne(top_disease, db_keys)
-            if score >= 70:
-                disease_data = ayurveda_db[best_match]
-                
-        disease_medicines = []
-        if isinstance(disease_data, dict):
-            age_map = {"children": "child", "youth": "young", "elderly": "elder"}
-            mapped_age = age_map.get(data.age_category.lower(), "young")
-            mapped_gender = "female" if data.gender.lower() == "female" else "male"
-            mapped_severity = data.severity.lower() if data.severity.lower() in ["low", "medium", "high"] else "medium"
-            composite_key = f"{mapped_age}_{mapped_gender}_{mapped_severity}"
-            disease_medicines = disease_data.get(composite_key, [])
-            if not disease_medicines:
-                for k, v in disease_data.items():
-                    if isinstance(v, list) and len(v) > 0:
-                        disease_medicines = v
-                        break
-        elif isinstance(disease_data, list):
-            disease_medicines = disease_data
-                
-        if not disease_medicines:
-            disease_medicines = [
-                {"medicine_name": "Divya Ashwagandha Vati", "dosage": "1 tablet twice daily"},
-                {"medicine_name": "Triphala Churna", "dosage": "1 teaspoon at bedtime"}
-            ]
-        
-        # 🚀 EXTRACTING ACTUAL HERBS FROM THE JSON
-        ayurveda_protocol_list = []
-        user_age_cat = data.age_category.lower()
-        user_severity = data.severity.lower()
-
-        for med in disease_medicines:
-            if isinstance(med, dict):
-                base_dose = med.get("dosage", "Standard Dose")
-                name = med.get("medicine_name", "Ayurvedic Protocol")
-                
-                # Fetch the array of real herbs from your medicine_master.json
-                herbs = med.get("herb_sanskrit", [])
-                
-                # Clean up scraping artifacts like "6 nights" or "9 times"
-                if isinstance(herbs, list) and len(herbs) > 0:
-                    clean_herbs = [
-                        str(h).title() for h in herbs 
-                        if not any(char.isdigit() for char in str(h)) 
-                        and "days" not in str(h).lower() 
-                        and "times" not in str(h).lower()
-                        and len(str(h)) > 2
-                    ]
-                    
-                    # If clean herbs exist, overwrite the generic "Protocol" name with the real medicines
-                    if clean_herbs:
-                        if "Protocol" in name or name == "Ayurvedic Herb":
-                            name = ", ".join(clean_herbs[:5])  # e.g., "Amalaki, Bibhitaki, Bilva"
-                        else:
-                            name = f"{name} ({', '.join(clean_herbs[:3])})"
+            cache_key = (tuple(sorted(valid_symptoms)), data.is_final_check, MODEL_VERSION)
+            cached = prediction_cache.get(cache_key)
+            if cached:
+                PREDICT_PATH_TOTAL.inc("ml_cached")
+                top_disease, confidence, feature_contributions = cached
             else:
-                base_dose = "Standard Dose"
-                name = str(med)
-
-            if user_age_cat in ["children", "elderly", "child", "elder"]:
-                if "Half Dose" not in base_dose:
-                    base_dose = f"Pediatric/Geriatric Scale (Half Dose): {base_dose}"
-            
-            if user_severity == "high":
-                if "INTENSIVE" not in base_dose:
-                    base_dose = f"INTENSIVE: {base_dose} (Requires Physician Monitoring)"
-
-            ayurveda_protocol_list.append({
-                "medicine_name": name,
-                "dosage": base_dose
-            })
-
-        mapped_gender = "female" if data.gender.lower() == "female" else "male"
-        if mapped_gender == "male": 
-            preg_warning = ["Not applicable for male patients."]
-        elif data.is_pregnant: 
-            preg_warning = ["Contraindicated during pregnancy. Consult a physician immediately."]
-        else: 
-            preg_warning = ["Safe for general use."]
-
-        return {
-            "status": "success",
-            "diagnosis": top_disease,
-            "confidence": round(float(confidence * 100), 2),
-            "extracted_symptoms": valid_symptoms,
-            "detected_severity": data.severity,
-            "prescription": {"pregnancy_status": preg_warning},
-            "ayurveda_protocol": ayurveda_protocol_list, 
-            "shap_explainability": feature_contributions 
-        }
+                PREDICT_PATH_TOTAL.inc("ml")
+                # With the dispatcher this span also covers queueing; the batch's SHAP pre-fill lands in the shap span
+                with PREDICT_STAGE_SECONDS.time("ensemble"):
+                    if inference_dispatcher:
+                        input_row = None
+                        raw_probabilities = inference_dispatcher.predict_proba(valid_symptoms)
+                    else:
+                        input_row = vectorizer.row(valid_symptoms)
+                        raw_probabilities = model.predict_proba(input_row)[0]
+                    top_position, top_disease, confidence = _rank_probabilities(raw_probabilities, data.is_final_check)
+
+                # XAI Feature Impact Calculation (SHAP)
+                if explanation_engine:
+                    try:
+                        with PREDICT_STAGE_SECONDS.time("shap"):
+                            feature_contributions = explanation_engine.explain(input_row, valid_symptoms, top_position)
+                    except Exception as e:
+                        print(f"WARN: SHAP explanation failed: {e}")
+                prediction_cache.put(cache_key, (top_disease, confidence, feature_contributions))
+            # Callers get their own list; cached entries must stay untouched
+            feature_contributions = [dict(c) for c in feature_contributions]
+
+        response, log_record = _finalize_diagnosis(data, clean_text, valid_symptoms, top_disease, confidence, feature_contributions)
+        if log_record:
+            with PREDICT_STAGE_SECONDS.time("log_write"):
+                log_sink.write(log_record, sync=EMERGENCY_LOG_SYNC_ACK and log_record["status"] == "EMERGENCY")
+        return response
     
     except Exception as e:
-        import traceback
-        print("\n❌ CRITICAL BACKEND CRASH DETECTED ❌")
-        traceback.print_exc() 
-        return {"status": "error", "message": f"Backend Error: {str(e)}"}
+        PREDICT_PATH_TOTAL.inc("error")
+        return _crash_response(e)
+
+@app.post("/predict/batch")
+def predict_batch(items: List[UserInput]):
+    """
+    Bulk triage: one nlp.pipe pass, one vectorized predict_proba, one SHAP call and
+    a single insert_many for the whole batch. Results keep the input order and the
+    exact shapes returned by /predict.
+    """
+    if len(items) > PREDICT_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {PREDICT_BATCH_MAX} items)")
+    _require_ready()
+    if not model:
+        return {"results": [{"error": "Model not loaded"} for _ in items]}
+
+    clean_texts = [data.text.replace("skip_followup.", "").strip() for data in items]
+    try:
+        with PREDICT_STAGE_SECONDS.time("batch_nlp"):
+            extractions = extract_and_map_symptoms_batch(clean_texts)
+    except Exception as e:
+        return {"results": [_crash_response(e)] * len(items)}
+
+    results = [None] * len(items)
+    diagnoses = {}
+    ml_positions = []
+    for i, (valid_symptoms, _) in enumerate(extractions):
+        if not valid_symptoms:
+            results[i] = _no_symptom_response(items[i])
+            continue
+        # Phase 1: Fast-Track Clinical Interceptor
+        top_disease = get_heuristic_diagnosis(valid_symptoms)
+        if top_disease:
+            diagnoses[i] = (top_disease, 0.98, [])
+        else:
+            ml_positions.append(i)
+    PREDICT_PATH_TOTAL.inc("heuristic", amount=len(diagnoses))
+    PREDICT_PATH_TOTAL.inc("ml", amount=len(ml_positions))
+
+    # Phase 2: one vectorized ensemble pass (+ one SHAP pass) over every remaining row
+    if ml_positions:
+        try:
+            ml_symptoms = [extractions[i][0] for i in ml_positions]
+            with PREDICT_STAGE_SECONDS.time("batch_ensemble"):
+                matrix = vectorizer.matrix([vectorizer.indices(s) for s in ml_symptoms])
+                probabilities = model.predict_proba(matrix)
+            if explanation_engine:
+                try:
+                    explanation_engine.explain_batch(matrix, ml_symptoms)
+                except Exception as e:
+                    print(f"WARN: Batched SHAP failed: {e}")
+            for i, raw_probabilities in zip(ml_positions, probabilities):
+                top_position, top_disease, confidence = _rank_probabilities(raw_probabilities, items[i].is_final_check)
+                feature_contributions = []
+                if explanation_engine:
+                    try:
+                        feature_contributions = explanation_engine.explain(None, extractions[i][0], top_position)
+                    except Exception as e:
+                        print(f"WARN: SHAP explanation failed: {e}")
+                diagnoses[i] = (top_disease, confidence, feature_contributions)
+        except Exception as e:
+            for i in ml_positions:
+                results[i] = _crash_response(e)
+
+    log_records = []
+    for i, (top_disease, confidence, feature_contributions) in diagnoses.items():
+        try:
+            results[i], log_record = _finalize_diagnosis(items[i], clean_texts[i], extractions[i][0], top_disease, confidence, feature_contributions)
+            if log_record:
+                log_records.append(log_record)
+        except Exception as e:
+            results[i] = _crash_response(e)
+
+    emergencies = [r for r in log_records if r["status"] == "EMERGENCY"]
+    if EMERGENCY_LOG_SYNC_ACK and emergencies:
+        log_sink.write_many(emergencies, sync=True)
+        log_records = [r for r in log_records if r["status"] != "EMERGENCY"]
+    log_sink.write_many(log_records)
+
+    return {"results": results}
 
 # ==========================================
 # AUTHENTICATION & USER MANAGEMENT
 # ==========================================
-@app.post("/register")
-def register_user(user: UserRegister):
+# bcrypt runs on its own small pool so login bursts cannot starve /predict's threadpool
+auth_executor = AuthExecutor.from_env()
+session_tokens = SessionTokens.from_env()
+
+async def _run_auth(fn, *args):
+    try:
+        return await auth_executor.run(fn, *args)
+    except AuthOverloaded as e:
+        print(f"WARN: Auth request rejected: {e}")
+        raise HTTPException(status_code=429, detail="Too many login attempts right now. Please retry shortly.", headers={"Retry-After": "1"})
+
+async def require_session(authorization: Optional[str] = Header(None)) -> str:
+    """Dependency: verifies the Bearer session token issued at login and returns the username."""
+    if not authorization or not authorization.lower().startswith("bearer "):
+        raise HTTPException(status_code=401, detail="Missing session token", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        return session_tokens.verify(authorization[7:].strip())
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+
+def _register_blocking(user: UserRegister):
+    try:
+        validate_biometrics(user.dict())
+    except InvalidProfileData as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if users_collection.find_one({"name": user.name}): raise HTTPException(status_code=400, detail="Username already exists")
-    hashed_password = bcrypt.hashpw(user.password.encode('utf-8'), bcrypt.gensalt())
-    dosha_info = generate_ayurvedic_profile(user)
-    users_collection.insert_one({**user.dict(), "password": hashed_password.decode('utf-8'), "ayurvedic_profile": dosha_info})
-    return {"message": "User registered successfully!", "profile": dosha_info}
+    hashed_password = auth_executor.hash_password(user.password)
+    try:
+        users_collection.insert_one({**user.dict(), "password": hashed_password, "ayurvedic_profile": None,
+                                     "profile_status": STATUS_PENDING, "profile_claimed_at": datetime.now()})
+    except DuplicateKeyError:
+        # Lost a registration race; the unique users.name index rejected the second insert
+        raise HTTPException(status_code=400, detail="Username already exists")
+
+    # The dosha profile is generated in the background; poll /profile/status or read it on login
+    profile_data = user.dict(exclude={"password"})
+    if not profile_jobs.enqueue(user.name, profile_data):
+        print(f"WARN: Profile queue full; using fallback profile for '{user.name}'.")
+        _store_profile(user.name, dict(FALLBACK_PROFILE), STATUS_FALLBACK)
+        return FALLBACK_PROFILE, STATUS_FALLBACK
+    return None, STATUS_PENDING
 
-@app.post("/login")
-def login_user(user: UserLogin):
+@app.post("/register")
+async def register_user(user: UserRegister):
+    with AUTH_SECONDS.time_outcome("register"):
+        profile, status = await _run_auth(_register_blocking, user)
+    return {"message": "User registered successfully!", "profile": profile, "profile_status": status,
+            "token": session_tokens.issue(user.name), "token_type": "bearer"}
+
+@app.get("/profile/status/{username}")
+def get_profile_status(username: str, session_user: str = Depends(require_session)):
+    if session_user != username:
+        raise HTTPException(status_code=403, detail="Session does not belong to this user")
+    db_user = users_collection.find_one({"name": username}, {"_id": 0, "ayurvedic_profile": 1, "profile_status": 1})
+    if not db_user:
+        raise HTTPException(status_code=404, detail="User not found")
+    # Accounts created before background generation have a profile but no status field
+    status = db_user.get("profile_status") or ("ready" if db_user.get("ayurvedic_profile") else STATUS_PENDING)
+    return {"username": username, "profile_status": status, "ayurvedic_profile": db_user.get("ayurvedic_profile")}
+
+def _login_blocking(user: UserLogin):
     db_user = users_collection.find_one({"name": user.name})
-    if not db_user or not bcrypt.checkpw(user.password.encode('utf-8'), db_user["password"].encode('utf-8')):
+    if not db_user or not auth_executor.check_password(user.password, db_user["password"]):
         raise HTTPException(status_code=400, detail="Invalid username or password")
-    return {"message": "Login successful", "user": {"name": db_user.get("name"), "ayurvedic_profile": db_user.get("ayurvedic_profile")}}
+    return db_user
+
+@app.post("/login")
+async def login_user(user: UserLogin):
+    with AUTH_SECONDS.time_outcome("login"):
+        db_user = await _run_auth(_login_blocking, user)
+    return {"message": "Login successful", "token": session_tokens.issue(db_user.get("name")), "token_type": "bearer",
+            "user": {"name": db_user.get("name"), "ayurvedic_profile": db_user.get("ayurvedic_profile"), "profile_status": db_user.get("profile_status", "ready")}}
 
 # ==========================================
 # E-COMMERCE & FINANCIAL TRANSACTIONS
 # ==========================================
-try:
-    razorpay_client = razorpay.Client(auth=(os.getenv("RAZORPAY_KEY_ID"), os.getenv("RAZORPAY_KEY_SECRET")))
-except:
-    razorpay_client = None
+razorpay_client = None
+
+def _get_razorpay_client():
+    global razorpay_client
+    if razorpay_client is None:
+        try:
+            razorpay_client = razorpay.Client(auth=(os.getenv("RAZORPAY_KEY_ID"), os.getenv("RAZORPAY_KEY_SECRET")))
+        except Exception as e:
+            print(f"ERROR: Razorpay client unavailable: {e}")
+    return razorpay_client
 
 class OrderRequest(BaseModel):
     amount: int; currency: str = "INR"
@@ -464,20 +849,58 @@ class PaymentVerification(BaseModel):
 
 @app.post("/create-order")
 def create_order(order: OrderRequest):
-    return {"order_id": razorpay_client.order.create({"amount": order.amount * 100, "currency": order.currency, "receipt": "receipt_" + str(datetime.now().timestamp())})["id"]}
+    with PAYMENT_SECONDS.time_outcome("create_order"):
+        return {"order_id": _get_razorpay_client().order.create({"amount": order.amount * 100, "currency": order.currency, "receipt": "receipt_" + str(datetime.now().timestamp())})["id"]}
 
 @app.post("/verify-payment")
 def verify_payment(data: PaymentVerification):
+    with PAYMENT_SECONDS.time_outcome("verify"):
+        try:
+            _get_razorpay_client().utility.verify_payment_signature({'razorpay_order_id': data.razorpay_order_id, 'razorpay_payment_id': data.razorpay_payment_id, 'razorpay_signature': data.razorpay_signature})
+            order_record = {"username": data.username, "order_id": data.razorpay_order_id, "amount_paid": data.total_amount, "status": "Paid", "timestamp": datetime.now()}
+            orders_collection.insert_one(order_record)
+        except: raise HTTPException(status_code=400, detail="Invalid Signature")
+    try:
+        analytics.record_order(order_record)
+    except Exception as e:
+        print(f"WARN: Revenue rollup update failed: {e}")
+    return {"status": "success"}
+
+@app.get("/admin/stats")
+def get_admin_stats(hours: int = 24, days: int = 30):
+    if analytics is None:
+        raise HTTPException(status_code=503, detail="Analytics store unavailable")
+    return analytics.stats(hours=max(1, min(hours, 24 * 31)), days=max(1, min(days, 366)))
+
+# Admin listings use keyset pagination on (timestamp, _id): pass `next_cursor` back as `after`
+def _admin_query(filters, after, fields, allowed_fields):
     try:
-        razorpay_client.utility.verify_payment_signature({'razorpay_order_id': data.razorpay_order_id, 'razorpay_payment_id': data.razorpay_payment_id, 'razorpay_signature': data.razorpay_signature})
-        orders_collection.insert_one({"username": data.username, "order_id": data.razorpay_order_id, "amount_paid": data.total_amount, "status": "Paid", "timestamp": datetime.now()})
-        return {"status": "success"}
-    except: raise HTTPException(status_code=400, detail="Invalid Signature")
+        query = admin_queries.build_query(filters, after)
+    except admin_queries.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    projection, selected = admin_queries.build_projection(fields, allowed_fields)
+    return query, projection, selected
 
 @app.get("/admin/orders")
-def get_all_orders():
-    return {"orders": [{**o, "timestamp": o["timestamp"].strftime("%Y-%m-%d %H:%M") if isinstance(o.get("timestamp"), datetime) else o.get("timestamp")} for o in list(orders_collection.find({}, {"_id": 0}).sort("timestamp", -1))]}
+def get_all_orders(limit: int = 100, after: Optional[str] = None, status: Optional[str] = None, username: Optional[str] = None, fields: Optional[str] = None):
+    query, projection, selected = _admin_query({"status": status, "username": username}, after, fields, admin_queries.ORDER_FIELDS)
+    orders, next_cursor = admin_queries.fetch_page(orders_collection, query, projection, selected, limit)
+    return {"orders": orders, "next_cursor": next_cursor}
+
+@app.get("/admin/orders/stream")
+def stream_all_orders(status: Optional[str] = None, username: Optional[str] = None, fields: Optional[str] = None):
+    query, projection, selected = _admin_query({"status": status, "username": username}, None, fields, admin_queries.ORDER_FIELDS)
+    return StreamingResponse(admin_queries.stream_ndjson(orders_collection, query, projection, selected), media_type="application/x-ndjson")
 
 @app.get("/admin/logs")
-def get_all_logs():
-    return {"logs": [{**l, "timestamp": l["timestamp"].strftime("%Y-%m-%d %H:%M") if isinstance(l.get("timestamp"), datetime) else l.get("timestamp")} for l in list(logs_collection.find({}, {"_id": 0}).sort("timestamp", -1))]}
\ No newline at end of file
+def get_all_logs(limit: int = 100, after: Optional[str] = None, status: Optional[str] = None, disease: Optional[str] = None, username: Optional[str] = None, fields: Optional[str] = None):
+    filters = {"status": status, "predicted_disease": disease, "username": username}
+    query, projection, selected = _admin_query(filters, after, fields, admin_queries.LOG_FIELDS)
+    logs, next_cursor = admin_queries.fetch_page(logs_collection, query, projection, selected, limit)
+    return {"logs": logs, "next_cursor": next_cursor}
+
+@app.get("/admin/logs/stream")
+def stream_all_logs(status: Optional[str] = None, disease: Optional[str] = None, username: Optional[str] = None, fields: Optional[str] = None):
+    filters = {"status": status, "predicted_disease": disease, "username": username}
+    query, projection, selected = _admin_query(filters, None, fields, admin_queries.LOG_FIELDS)
+    return StreamingResponse(admin_queries.stream_ndjson(logs_collection, query, projection, selected), media_type="application/x-ndjson")
\ No newline at end of file
@@ -0,0 +1,204 @@
+# metrics.py
+
+# Minimal in-process metrics with Prometheus text exposition (GET /metrics).
+# A slow /predict used to be diagnosable only from print() lines. Each phase is now timed
+# with a span that costs two perf_counter() calls, one bisect and one short lock, so
+# spans can stay on the hot path. Component stats that already exist (dispatcher,
+# caches, log sink, auth pool) are folded in as gauges at scrape time instead of being
+# tracked twice.
+
+import re
+import threading
+from bisect import bisect_left
+from time import perf_counter
+
+# Seconds; tuned for a path that ranges from ~50us (cache hit) to a few seconds (cold SHAP/LLM)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class _Span:
+    __slots__ = ("histogram", "labelvalues", "start")
+
+    def __init__(self, histogram, labelvalues):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(perf_counter() - self.start, *self.labelvalues)
+        return False
+
+
+class _OutcomeSpan(_Span):
+    __slots__ = ()
+
+    def __exit__(self, exc_type, exc, tb):
+        # HTTP errors are labelled with their status code, anything else unexpected as "error"
+        outcome = "ok" if exc is None else str(getattr(exc, "status_code", "error"))
+        self.histogram.observe(perf_counter() - self.start, *self.labelvalues, outcome)
+        return False
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labelvalues -> [per-bucket counts (+Inf last), sum, count]; counts are made cumulative on export
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *labelvalues):
+        """`with histogram.time("nlp"):` records the block's wall time in seconds."""
+        return _Span(self, labelvalues)
+
+    def time_outcome(self, *labelvalues):
+        """Like time(), with a trailing `outcome` label ("ok", an HTTP status code, or "error")."""
+        return _OutcomeSpan(self, labelvalues)
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._series.items())
+        for labelvalues, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                labels = _format_labels(self.labelnames, labelvalues, ("le", _format_value(float(bound))))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._stats_sources = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_stats(self, prefix, stats_fn):
+        """
+        Exports the numeric values of an existing `stats()` dict as gauges named
+        `<prefix>_<key>`. Nested dicts (e.g. histograms keyed by bucket) become one gauge
+        with a `key` label. String values (versions, sources) become labels of a single
+        info-style `<prefix>_info` gauge with value 1, e.g. kb_info{version="..."} 1.
+        stats_fn may return None when the component is not loaded.
+        """
+        self._stats_sources.append((prefix, stats_fn))
+
+    def _collect_stats(self, prefix, stats_fn):
+        try:
+            stats = stats_fn()
+        except Exception as e:
+            return [f"# {prefix} stats unavailable: {_INVALID_NAME_CHARS.sub(' ', str(e))}"]
+        lines = []
+        info = {}
+        for key, value in (stats or {}).items():
+            name = _INVALID_NAME_CHARS.sub("_", f"{prefix}_{key}")
+            if isinstance(value, str):
+                info[_INVALID_NAME_CHARS.sub("_", str(key))] = value
+                continue
+            if isinstance(value, bool) or not isinstance(value, (int, float, dict)):
+                continue
+            lines.append(f"# TYPE {name} gauge")
+            if isinstance(value, dict):
+                for sub_key, sub_value in value.items():
+                    if isinstance(sub_value, (int, float)) and not isinstance(sub_value, bool):
+                        lines.append(f"{name}{_format_labels(('key',), (sub_key,))} {_format_value(sub_value)}")
+            else:
+                lines.append(f"{name} {_format_value(value)}")
+        if info:
+            name = _INVALID_NAME_CHARS.sub("_", f"{prefix}_info")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name}{_format_labels(tuple(info), tuple(info.values()))} 1")
+        return lines
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        for prefix, stats_fn in self._stats_sources:
+            lines.extend(self._collect_stats(prefix, stats_fn))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ==========================================
+# METRICS SHARED BY THE API
+# ==========================================
+PREDICT_STAGE_SECONDS = REGISTRY.histogram(
+    "diagnosis_stage_seconds", "Wall time per /predict phase.", ("stage",))
+PREDICT_PATH_TOTAL = REGISTRY.counter(
+    "diagnosis_path_total", "Diagnoses by decision path (heuristic interceptor vs ML ensemble).", ("path",))
+AUTH_SECONDS = REGISTRY.histogram(
+    "auth_request_seconds", "Register/login latency, including time queued for the auth executor.", ("operation", "outcome"))
+PAYMENT_SECONDS = REGISTRY.histogram(
+    "payment_request_seconds", "Razorpay order creation and verification latency.", ("operation", "outcome"))
@@ -0,0 +1,131 @@
+# prescription_table.py
+
+# Phase 4 of /predict, compiled ahead of time.
+# Everything the endpoint used to do per response (composite age/gender/severity key,
+# fallback scan, herb-name cleanup, dosage scaling, pregnancy note) is deterministic given
+# the KB, so it is rendered once per (disease, age, gender, severity, pregnancy) profile
+# into an immutable table. A request is then one dict lookup plus a shallow copy.
+
+import itertools
+from types import MappingProxyType
+
+AGE_MAP = {"children": "child", "youth": "young", "elderly": "elder"}
+HALF_DOSE_AGES = {"children", "elderly", "child", "elder"}
+SEVERITIES = ("low", "medium", "high")
+
+DEFAULT_MEDICINES = [
+    {"medicine_name": "Divya Ashwagandha Vati", "dosage": "1 tablet twice daily"},
+    {"medicine_name": "Triphala Churna", "dosage": "1 teaspoon at bedtime"}
+]
+
+# (mapped_age, half_dose) pairs reachable from the age_category values the API accepts
+AGE_PROFILES = sorted({(AGE_MAP.get(a, "young"), a in HALF_DOSE_AGES) for a in list(HALF_DOSE_AGES) + ["youth", "adult"]})
+GENDER_PROFILES = (("male", False), ("female", False), ("female", True))
+
+
+def profile_key(age_category, gender, severity, is_pregnant):
+    """Normalises raw request fields into the table's profile key."""
+    age_cat = age_category.lower()
+    mapped_gender = "female" if gender.lower() == "female" else "male"
+    mapped_severity = severity.lower() if severity.lower() in SEVERITIES else "medium"
+    return (
+        AGE_MAP.get(age_cat, "young"),
+        age_cat in HALF_DOSE_AGES,
+        mapped_gender,
+        mapped_severity,
+        bool(is_pregnant) and mapped_gender == "female",
+    )
+
+
+def _clean_medicine_name(med):
+    name = med.get("medicine_name", "Ayurvedic Protocol")
+
+    # Fetch the array of real herbs from your medicine_master.json
+    herbs = med.get("herb_sanskrit", [])
+
+    # Clean up scraping artifacts like "6 nights" or "9 times"
+    if isinstance(herbs, list) and len(herbs) > 0:
+        clean_herbs = [
+            str(h).title() for h in herbs
+            if not any(char.isdigit() for char in str(h))
+            and "days" not in str(h).lower()
+            and "times" not in str(h).lower()
+            and len(str(h)) > 2
+        ]
+
+        # If clean herbs exist, overwrite the generic "Protocol" name with the real medicines
+        if clean_herbs:
+            if "Protocol" in name or name == "Ayurvedic Herb":
+                name = ", ".join(clean_herbs[:5])  # e.g., "Amalaki, Bibhitaki, Bilva"
+            else:
+                name = f"{name} ({', '.join(clean_herbs[:3])})"
+    return name
+
+
+def _select_medicines(disease_data, mapped_age, mapped_gender, mapped_severity):
+    disease_medicines = []
+    if isinstance(disease_data, dict):
+        composite_key = f"{mapped_age}_{mapped_gender}_{mapped_severity}"
+        disease_medicines = disease_data.get(composite_key, [])
+        if not disease_medicines:
+            for k, v in disease_data.items():
+                if isinstance(v, list) and len(v) > 0:
+                    disease_medicines = v
+                    break
+    elif isinstance(disease_data, list):
+        disease_medicines = disease_data
+    return disease_medicines or DEFAULT_MEDICINES
+
+
+def _render(disease_data, profile):
+    mapped_age, half_dose, mapped_gender, mapped_severity, pregnant = profile
+    protocol = []
+    for med in _select_medicines(disease_data, mapped_age, mapped_gender, mapped_severity):
+        if isinstance(med, dict):
+            base_dose = med.get("dosage", "Standard Dose")
+            name = _clean_medicine_name(med)
+        else:
+            base_dose = "Standard Dose"
+            name = str(med)
+
+        if half_dose and "Half Dose" not in base_dose:
+            base_dose = f"Pediatric/Geriatric Scale (Half Dose): {base_dose}"
+        if mapped_severity == "high" and "INTENSIVE" not in base_dose:
+            base_dose = f"INTENSIVE: {base_dose} (Requires Physician Monitoring)"
+        protocol.append((name, base_dose))
+
+    if mapped_gender == "male":
+        preg_warning = "Not applicable for male patients."
+    elif pregnant:
+        preg_warning = "Contraindicated during pregnancy. Consult a physician immediately."
+    else:
+        preg_warning = "Safe for general use."
+    return preg_warning, tuple(protocol)
+
+
+class PrescriptionTable:
+    def __init__(self, ayurveda_db):
+        table = {}
+        profiles = [
+            (age, half_dose, gender, severity, pregnant)
+            for (age, half_dose), (gender, pregnant), severity in itertools.product(AGE_PROFILES, GENDER_PROFILES, SEVERITIES)
+        ]
+        # kb_key None = diagnosis without a KB entry (default protocol)
+        for kb_key, disease_data in itertools.chain([(None, {})], ayurveda_db.items()):
+            for profile in profiles:
+                table[(kb_key, profile)] = _render(disease_data, profile)
+        self._table = MappingProxyType(table)
+        self._db = ayurveda_db
+
+    def __len__(self):
+        return len(self._table)
+
+    def lookup(self, kb_key, age_category, gender, severity, is_pregnant):
+        """Returns (pregnancy_status, ayurveda_protocol) as fresh lists the caller may mutate."""
+        key = (kb_key, profile_key(age_category, gender, severity, is_pregnant))
+        entry = self._table.get(key)
+        if entry is None:
+            # Key outside the precompiled set (should not happen); render on the fly
+            entry = _render(self._db.get(kb_key, {}) if kb_key is not None else {}, key[1])
+        preg_warning, protocol = entry
+        return [preg_warning], [{"medicine_name": name, "dosage": dose} for name, dose in protocol]
@@ -0,0 +1,138 @@
+# profile_jobs.py
+
+# Background pipeline for Gemini dosha-profile generation.
+# /register used to block on bcrypt AND a full LLM round trip. Users are now stored
+# immediately with profile_status="pending" and the profile is generated here, on a
+# bounded worker pool with per-attempt timeouts and retries. Only transient failures
+# (network, timeouts, malformed LLM replies) are retried; input that can never produce
+# a profile (e.g. height 0) is rejected at /register or falls back on the first attempt.
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+FALLBACK_PROFILE = {"dosha": "Vata-Kapha", "description": "Fallback profile generated."}
+
+STATUS_PENDING = "pending"
+STATUS_READY = "ready"
+STATUS_FALLBACK = "fallback"
+
+# Plausible adult/child ranges; anything outside cannot yield a meaningful BMI
+HEIGHT_RANGE_CM = (50.0, 260.0)
+WEIGHT_RANGE_KG = (2.0, 400.0)
+
+
+class InvalidProfileData(ValueError):
+    """Biometrics no generator attempt can turn into a profile; never retried."""
+
+
+# Deterministic failures: retrying the same input would fail the same way
+PERMANENT_ERRORS = (InvalidProfileData, ArithmeticError, TypeError, KeyError, AttributeError)
+
+
+def validate_biometrics(profile_data):
+    """Raises InvalidProfileData when height/weight are missing or outside a plausible range."""
+    for field, (low, high) in (("height", HEIGHT_RANGE_CM), ("weight", WEIGHT_RANGE_KG)):
+        try:
+            value = float(profile_data.get(field))
+        except (TypeError, ValueError):
+            raise InvalidProfileData(f"{field} must be a number")
+        if not low <= value <= high:
+            raise InvalidProfileData(f"{field} must be between {low:g} and {high:g}")
+
+
+class LocalStubGenerator:
+    """Deterministic, offline profile generator for tests and local development."""
+
+    def __call__(self, profile_data, timeout=None):
+        height_m = (profile_data.get("height") or 170) / 100.0
+        bmi = (profile_data.get("weight") or 65) / (height_m ** 2)
+        frame = str(profile_data.get("frame", "Medium")).lower()
+        if bmi < 19 or frame == "small":
+            dosha = "Vata"
+        elif bmi > 26 or frame == "large":
+            dosha = "Kapha"
+        else:
+            dosha = "Pitta"
+        return {
+            "dosha": dosha,
+            "description": f"Locally generated {dosha} profile (stub generator).",
+            "metabolism_insight": "Balanced",
+            "ideal_exercise": "Moderate",
+        }
+
+
+class ProfileJobQueue:
+    def __init__(self, generator, on_complete, max_workers=4, max_pending=256, timeout=20.0,
+                 max_retries=3, backoff_seconds=1.0):
+        """
+        generator(profile_data, timeout) -> dict, raising on failure.
+        on_complete(username, profile, status) persists the outcome.
+        """
+        self.generator = generator
+        self.on_complete = on_complete
+        self.timeout = timeout
+        self.max_retries = max(int(max_retries), 1)
+        self.backoff_seconds = backoff_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="profile-job")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._stats_lock = threading.Lock()
+        self.completed = 0
+        self.fallbacks = 0
+        self.retries = 0
+        self.rejected = 0
+
+    def enqueue(self, username, profile_data):
+        """Returns False (without queueing) when max_pending jobs are already waiting."""
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self.rejected += 1
+            return False
+        try:
+            self._executor.submit(self._run, username, dict(profile_data))
+        except RuntimeError:
+            # Executor already shut down
+            self._slots.release()
+            return False
+        return True
+
+    def _run(self, username, profile_data):
+        try:
+            profile, status = None, STATUS_FALLBACK
+            for attempt in range(1, self.max_retries + 1):
+                try:
+                    profile = self.generator(profile_data, timeout=self.timeout)
+                    status = STATUS_READY
+                    break
+                except PERMANENT_ERRORS as e:
+                    print(f"WARN: Profile generation for '{username}' cannot succeed ({type(e).__name__}: {e}); using fallback.")
+                    break
+                except Exception as e:
+                    print(f"WARN: Profile generation for '{username}' failed (attempt {attempt}/{self.max_retries}): {e}")
+                    if attempt < self.max_retries:
+                        with self._stats_lock:
+                            self.retries += 1
+                        time.sleep(self.backoff_seconds * (2 ** (attempt - 1)))
+            if status == STATUS_FALLBACK:
+                profile = dict(FALLBACK_PROFILE)
+            try:
+                self.on_complete(username, profile, status)
+            except Exception as e:
+                print(f"ERROR: Could not store profile for '{username}': {e}")
+            with self._stats_lock:
+                self.completed += 1
+                self.fallbacks += status == STATUS_FALLBACK
+        finally:
+            self._slots.release()
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "completed": self.completed,
+                "fallbacks": self.fallbacks,
+                "retries": self.retries,
+                "rejected": self.rejected,
+            }
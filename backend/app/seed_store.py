@@ -1,9 +1,10 @@
 import os
 import json
+import hashlib
+from datetime import datetime
 from pymongo import MongoClient
 from dotenv import load_dotenv
-from google import genai
-from google.genai import types
+from llm_cache import LLMCache, LLMClient, StubLLMBackend
 
 load_dotenv()
 
@@ -11,8 +12,69 @@ print("🌿 Connecting to MongoDB Atlas...")
 client = MongoClient(os.getenv("MONGO_URI"))
 db = client["diagnosis_system"]
 inventory_collection = db["pharmacy_products_final"]
+store_meta_collection = db["store_meta"]
 
-gemini_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+SEED_MODEL_NAME = "gemini-2.5-flash"
+llm_cache = LLMCache.from_env(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "llm_cache.sqlite3"))
+
+def _gemini_backend(prompt, timeout=None):
+    from google import genai
+    from google.genai import types
+    gemini_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+    response = gemini_client.models.generate_content(
+        model=SEED_MODEL_NAME,
+        contents=prompt,
+        config=types.GenerateContentConfig(response_mime_type="application/json")
+    )
+    return response.text
+
+def _stub_catalog_reply(names):
+    # LLM_BACKEND=stub: deterministic prices/descriptions so seeding works offline
+    def reply(prompt):
+        return json.dumps([
+            {"id": i, "name": name, "price": 150 + int(hashlib.sha1(name.encode("utf-8")).hexdigest(), 16) % 1851,
+             "desc": f"Traditional Ayurvedic {name} for everyday wellness."}
+            for i, name in enumerate(names, 1)
+        ])
+    return reply
+
+# Per-product records (keyed by the catalog's own name), so a reseed only asks Gemini
+# about products it has never described
+CATALOG_NAMESPACE = f"catalog-item/{SEED_MODEL_NAME}"
+
+def _item_key(name):
+    return name.strip().lower()
+
+def _generate_descriptions(names):
+    prompt = f"""
+    Act as an expert Ayurvedic Store Manager. I have {len(names)} items: {", ".join(names)}.
+    
+    For EVERY SINGLE item, generate:
+    1. A realistic price in INR (between ₹150 and ₹2000).
+    2. A highly compelling, 1-sentence product description.
+
+    Return EXACTLY a JSON array of objects with keys: "id" (start from 1), "name", "price", "desc". 
+    Do NOT include an image key in the JSON.
+    """
+    backend = StubLLMBackend(_stub_catalog_reply(names)) if os.getenv("LLM_BACKEND") == "stub" else _gemini_backend
+    text = LLMClient(backend, llm_cache, SEED_MODEL_NAME).generate(prompt, validate=json.loads)
+
+    # Map every returned item back to the name we asked about: Gemini sometimes rewrites
+    # names, so an exact (case-insensitive) match wins, then the 1-based "id" position
+    requested = {_item_key(name): name for name in names}
+    described = {}
+    for item in json.loads(text):
+        name = requested.get(_item_key(str(item.get("name", ""))))
+        if name is None and isinstance(item.get("id"), int) and 1 <= item["id"] <= len(names):
+            name = names[item["id"] - 1]
+        if name is None or name in described:
+            continue
+        described[name] = {"price": item.get("price"), "desc": item.get("desc")}
+        llm_cache.put_record(CATALOG_NAMESPACE, _item_key(name), json.dumps(described[name]))
+    unmatched = len(names) - len(described)
+    if unmatched:
+        print(f"⚠️  {unmatched} product(s) missing from the AI reply; they will be retried on the next seed.")
+    return described
 
 def seed_database():
     current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -61,26 +123,27 @@ def seed_database():
     ]
     
     full_catalog = med_list + extra_products
-    print(f"🤖 Generating AI descriptions and prices for {len(full_catalog)} products...")
-    
-    prompt = f"""
-    Act as an expert Ayurvedic Store Manager. I have {len(full_catalog)} items: {", ".join(full_catalog)}.
-    
-    For EVERY SINGLE item, generate:
-    1. A realistic price in INR (between ₹150 and ₹2000).
-    2. A highly compelling, 1-sentence product description.
 
-    Return EXACTLY a JSON array of objects with keys: "id" (start from 1), "name", "price", "desc". 
-    Do NOT include an image key in the JSON.
-    """
-    
-    response = gemini_client.models.generate_content(
-        model='gemini-2.5-flash',
-        contents=prompt,
-        config=types.GenerateContentConfig(response_mime_type="application/json")
-    )
-    
-    products = json.loads(response.text)
+    described = {}
+    missing = []
+    for name in full_catalog:
+        cached = llm_cache.get_record(CATALOG_NAMESPACE, _item_key(name))
+        if cached is not None:
+            described[name] = json.loads(cached)
+        else:
+            missing.append(name)
+    print(f"♻️  {len(described)} product descriptions reused from the LLM cache.")
+
+    if missing:
+        print(f"🤖 Generating AI descriptions and prices for {len(missing)} products...")
+        described.update(_generate_descriptions(missing))
+
+    # Only catalog names are ever stored, in catalog order
+    ordered_names = [n for n in full_catalog if n in described]
+    products = [
+        {"id": i, "name": name, "price": described[name].get("price"), "desc": described[name].get("desc")}
+        for i, name in enumerate(ordered_names, 1)
+    ]
     
     # 🚀 BULLETPROOF IMAGE MAPPING
     for item in products:
@@ -107,6 +170,13 @@ def seed_database():
     print("💾 Saving to MongoDB with verified image paths...")
     inventory_collection.delete_many({}) 
     inventory_collection.insert_many(products)
+    # Bump the catalog version so every API worker refreshes its /medicines snapshot
+    store_meta_collection.update_one(
+        {"_id": "catalog"},
+        {"$set": {"version": datetime.now().strftime("%Y%m%d%H%M%S%f"), "updated_at": datetime.now()}},
+        upsert=True,
+    )
+    print(f"📈 LLM cache: {llm_cache.stats()}")
     print("✅ SUCCESS! Store database is 100% verified and ready.")
 
 if __name__ == "__main__":
@@ -0,0 +1,156 @@
+# startup.py
+
+# Background startup subsystem for the API workers.
+# Heavy artifacts (joblib models, Ayurveda KB, spaCy) load concurrently off the import path,
+# optional SDKs are imported on first use, and the worker only reports ready once a
+# warm-up batch of synthetic predictions has gone through the whole ML path. A failed
+# required task or warm-up leaves the worker permanently not ready (failed), so the load
+# balancer never routes traffic to a worker that would answer with placeholders.
+
+import importlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# module name -> seconds spent importing it (eager, lazy and background imports alike)
+IMPORT_TIMINGS = {}
+_import_lock = threading.Lock()
+
+
+def timed_import(name):
+    """importlib.import_module that records how long the (first) import took."""
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    elapsed = time.perf_counter() - started
+    with _import_lock:
+        IMPORT_TIMINGS.setdefault(name, elapsed)
+    return module
+
+
+def record_import_time(name, seconds):
+    """Records an import block that was timed by the caller (e.g. a module's top-level imports)."""
+    with _import_lock:
+        IMPORT_TIMINGS.setdefault(name, seconds)
+
+
+class LazyModule:
+    """Module proxy that defers the real import until an attribute is first used."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = timed_import(self._name)
+        return getattr(self._module, attr)
+
+
+def lazy_module(name):
+    return LazyModule(name)
+
+
+class StartupManager:
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self._tasks = []
+        self._warmup = None
+        self.task_timings = {}
+        self.task_errors = {}
+        self.required_tasks = set()
+        self.failed = False
+        self.finished_at = None
+        self.warmup_seconds = None
+        self.warmup_error = None
+        self.started_at = None
+        self.ready_at = None
+        self._ready = threading.Event()
+        self._thread = None
+
+    def add_task(self, name, fn, required=True):
+        """Optional tasks only log their failure; a failed required task blocks readiness."""
+        self._tasks.append((name, fn))
+        if required:
+            self.required_tasks.add(name)
+
+    def set_warmup(self, fn):
+        self._warmup = fn
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    @property
+    def status(self):
+        if self.ready:
+            return "ready"
+        return "failed" if self.failed else "starting"
+
+    def wait_ready(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def start(self, background=True):
+        if self._thread is not None:
+            return
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="startup", daemon=True)
+        self._thread.start()
+        if not background:
+            self._thread.join()
+
+    def _timed(self, name, fn):
+        started = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            self.task_errors[name] = str(e)
+            print(f"ERROR: Startup task '{name}' failed: {e}")
+        finally:
+            self.task_timings[name] = time.perf_counter() - started
+
+    def _run(self):
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="startup") as pool:
+            for future in [pool.submit(self._timed, name, fn) for name, fn in self._tasks]:
+                future.result()
+
+        failed_required = sorted(self.required_tasks & set(self.task_errors))
+        # Warming up on half-loaded artifacts would only add a second, misleading error
+        if self._warmup is not None and not failed_required:
+            started = time.perf_counter()
+            try:
+                self._warmup()
+            except Exception as e:
+                self.warmup_error = str(e)
+                print(f"ERROR: Warm-up failed: {e}")
+            self.warmup_seconds = time.perf_counter() - started
+
+        self.finished_at = time.time()
+        if failed_required or self.warmup_error:
+            self.failed = True
+            reason = f"required tasks failed: {', '.join(failed_required)}" if failed_required else "warm-up failed"
+            print(f"ERROR: Worker NOT ready after {self.finished_at - self.started_at:.2f}s ({reason}).")
+        else:
+            self.ready_at = self.finished_at
+            self._ready.set()
+            print(f"INFO: Worker ready in {self.ready_at - self.started_at:.2f}s.")
+        for line in self.report_lines():
+            print(f"INFO:   {line}")
+
+    def report_lines(self):
+        lines = [f"task {name}: {seconds * 1000:.0f} ms" for name, seconds in sorted(self.task_timings.items(), key=lambda x: -x[1])]
+        if self.warmup_seconds is not None:
+            lines.append(f"warm-up: {self.warmup_seconds * 1000:.0f} ms")
+        lines += [f"import {name}: {seconds * 1000:.0f} ms" for name, seconds in sorted(IMPORT_TIMINGS.items(), key=lambda x: -x[1])]
+        return lines
+
+    def report(self):
+        return {
+            "ready": self.ready,
+            "status": self.status,
+            "startup_seconds": round(self.ready_at - self.started_at, 3) if self.ready_at else None,
+            "tasks_ms": {name: round(s * 1000, 1) for name, s in self.task_timings.items()},
+            "task_errors": dict(self.task_errors),
+            "warmup_ms": round(self.warmup_seconds * 1000, 1) if self.warmup_seconds is not None else None,
+            "warmup_error": self.warmup_error,
+            "imports_ms": {name: round(s * 1000, 1) for name, s in sorted(IMPORT_TIMINGS.items(), key=lambda x: -x[1])},
+        }
@@ -1,30 +1,46 @@
 import joblib
 import os
+import sys
+import json
+import time
+import hashlib
+import itertools
+import multiprocessing
+from collections import deque
+from datetime import datetime
 import spacy
 from spacy.matcher import PhraseMatcher
+from spacy.tokens import Doc
 import re
-from thefuzz import process, fuzz
+from text_matcher import SymptomDictionaryMatcher
+from fuzzy_index import FuzzySymptomIndex
+
+# Only tokens, lemmas, is_stop and is_alpha are used. The lemmatizer needs the tagger +
+# attribute_ruler (POS), but the dependency parser and NER are dead weight on every call.
+NLP_EXCLUDE = ["parser", "ner", "senter"]
+
+SPACY_MODEL = "en_core_web_sm"
 
 print("INFO: Loading spaCy NLP model for symptom extraction...")
 try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    print("Downloading spaCy model...")
-    import subprocess
-    subprocess.run(["python", "-m", "spacy", "download", "en_core_web_sm"])
-    nlp = spacy.load("en_core_web_sm")
+    nlp = spacy.load(SPACY_MODEL, exclude=NLP_EXCLUDE)
+except OSError as e:
+    # No download at import time: workers must not hit the network or spawn pip on boot
+    raise RuntimeError(
+        f"spaCy model '{SPACY_MODEL}' is not installed. Install the pinned wheel from requirements.txt "
+        f"(pip install -r requirements.txt) or run: python -m spacy download {SPACY_MODEL}"
+    ) from e
+print(f"INFO: spaCy pipeline: {', '.join(nlp.pipe_names)}")
 
+# Resolved from this file, not the working directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.normpath(os.path.join(current_dir, "..", "models"))
+SYMPTOMS_LIST_PATH = os.path.join(MODELS_DIR, "symptoms_list.pkl")
 try:
-    # Ensure this path matches where your ensemble saves the list
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    VALID_SYMPTOMS = joblib.load(os.path.join(current_dir, '../models/symptoms_list.pkl'))
+    VALID_SYMPTOMS = joblib.load(SYMPTOMS_LIST_PATH)
 except FileNotFoundError:
-    try:
-        # Fallback path just in case it runs from root
-        VALID_SYMPTOMS = joblib.load('models/symptoms_list.pkl')
-    except:
-        print("ERROR: models/symptoms_list.pkl not found. Run train_ensemble.py first.")
-        VALID_SYMPTOMS = []
+    print(f"ERROR: {SYMPTOMS_LIST_PATH} not found. Run train_model.py first.")
+    VALID_SYMPTOMS = []
 
 # ==========================================
 # 🚀 MASSIVELY EXPANDED SYMPTOM DICTIONARY
@@ -123,25 +139,139 @@ DIRECT_CONDITION_MAP = {
     "common cold": ["continuous_sneezing", "chills", "cough", "high_fever", "runny_nose", "congestion"]
 }
 
-matcher = PhraseMatcher(nlp.vocab, attr="LEMMA")
-for phrase, features in SYMPTOM_MAP.items():
-    pattern = nlp(phrase)
-    matcher.add(phrase, [pattern])
+# ==========================================
+# PREBUILT NLP ARTIFACT
+# ==========================================
+# The lemmatized SYMPTOM_MAP patterns (the only part that needs the spaCy pipeline) are
+# built once by:  python symptom_nlp.py --build-artifact
+# and loaded here instead of parsing every phrase on each worker boot. The artifact holds
+# plain tables only; the PhraseMatcher, the dictionary automaton and the fuzzy index are
+# constructed from them and the source tables at import, so code changes to text_matcher
+# or fuzzy_index never meet objects pickled by older code. The fingerprint covers every
+# table, the symptom list and the spaCy model version. A stale artifact raises (main.py
+# then keeps the worker unready); a missing one is compiled in-process with a warning.
+NLP_ARTIFACT_PATH = os.path.join(MODELS_DIR, "symptom_nlp_artifact.json")
+NLP_ARTIFACT_FORMAT = 2
+
+def artifact_fingerprint():
+    payload = {
+        "format": NLP_ARTIFACT_FORMAT,
+        "spacy_model": [SPACY_MODEL, nlp.meta.get("version")],
+        "pipeline": nlp.pipe_names,
+        "symptom_map": SYMPTOM_MAP,
+        "strong_keywords": STRONG_KEYWORDS,
+        "flexible_matches": sorted([w1, w2, feature] for (w1, w2), feature in FLEXIBLE_MATCHES.items()),
+        "direct_condition_map": DIRECT_CONDITION_MAP,
+        "valid_symptoms": list(VALID_SYMPTOMS),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+def compile_artifact():
+    """Runs the pipeline over every SYMPTOM_MAP phrase."""
+    return {
+        "format": NLP_ARTIFACT_FORMAT,
+        "fingerprint": artifact_fingerprint(),
+        "spacy_model": f"{SPACY_MODEL}-{nlp.meta.get('version')}",
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+        # phrase -> [token texts, lemmas]: enough to rebuild the LEMMA PhraseMatcher without parsing
+        "phrase_lemmas": {
+            phrase: [[t.text for t in doc], [t.lemma_ for t in doc]]
+            for phrase, doc in zip(SYMPTOM_MAP, nlp.pipe(SYMPTOM_MAP))
+        },
+    }
+
+def build_artifact(artifact=None, path=NLP_ARTIFACT_PATH):
+    artifact = artifact or compile_artifact()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, ensure_ascii=False, sort_keys=True)
+    os.replace(tmp_path, path)
+    print(f"INFO: NLP artifact written to {path} (fingerprint {artifact['fingerprint'][:12]}).")
+    return artifact
+
+def load_artifact(path=NLP_ARTIFACT_PATH):
+    start = time.perf_counter()
+    if not os.path.exists(path):
+        print(f"WARN: {path} not found; compiling NLP tables in-process. Run 'python symptom_nlp.py --build-artifact'.")
+        return compile_artifact()
+    with open(path, encoding="utf-8") as f:
+        artifact = json.load(f)
+    if artifact.get("format") != NLP_ARTIFACT_FORMAT or artifact.get("fingerprint") != artifact_fingerprint():
+        raise RuntimeError(
+            f"Stale NLP artifact {path} (built {artifact.get('built_at')}): the symptom dictionaries, "
+            f"symptoms_list.pkl or the spaCy model changed. Rebuild it with 'python symptom_nlp.py --build-artifact'."
+        )
+    print(f"INFO: NLP artifact loaded in {(time.perf_counter() - start) * 1000:.1f}ms (built {artifact['built_at']}).")
+    return artifact
+
+def _phrase_matcher(phrase_lemmas):
+    phrase_matcher = PhraseMatcher(nlp.vocab, attr="LEMMA")
+    for phrase, (words, lemmas) in phrase_lemmas.items():
+        phrase_matcher.add(phrase, [Doc(nlp.vocab, words=words, lemmas=lemmas)])
+    return phrase_matcher
+
+# `python symptom_nlp.py --build-artifact` must not trip over the artifact it is replacing
+_artifact = compile_artifact() if __name__ == "__main__" and "--build-artifact" in sys.argv[1:] else load_artifact()
+matcher = _phrase_matcher(_artifact["phrase_lemmas"])
+# Every substring table below the PhraseMatcher, compiled into one Aho-Corasick automaton
+dictionary_matcher = SymptomDictionaryMatcher(STRONG_KEYWORDS, FLEXIBLE_MATCHES, DIRECT_CONDITION_MAP, VALID_SYMPTOMS)
+# Typo tolerance: every word of a request scored in one vectorized call per table (same >= 85 semantics)
+fuzzy_index = FuzzySymptomIndex(VALID_SYMPTOMS, DIRECT_CONDITION_MAP.keys(), threshold=85)
+
+HIGH_SEVERITY_WORDS = frozenset(["severe", "terrible", "blinding", "unbearable", "extreme", "bad", "worst", "killing", "intense"])
+LOW_SEVERITY_WORDS = frozenset(["mild", "slight", "little", "minor", "bearable"])
 
 def extract_severity(text):
-    doc = nlp(text.lower())
+    return _severity_from_doc(nlp(text.lower()))
+
+def _severity_from_doc(doc):
+    # Last severity word wins, as before; doc must come from the lower-cased input
     severity = "medium" 
-    high_sev = ["severe", "terrible", "blinding", "unbearable", "extreme", "bad", "worst", "killing", "intense"]
-    low_sev = ["mild", "slight", "little", "minor", "bearable"]
     for token in doc:
-        if token.text in high_sev:
+        if token.text in HIGH_SEVERITY_WORDS:
             severity = "high"
-        elif token.text in low_sev:
+        elif token.text in LOW_SEVERITY_WORDS:
             severity = "low"
     return severity
 
 def extract_and_map_symptoms(user_input: str):
-    doc = nlp(user_input.lower())
+    return _map_doc(nlp(user_input.lower()), user_input)
+
+def extract_and_map_symptoms_batch(texts, n_process=1, batch_size=64):
+    """
+    Same output as calling extract_and_map_symptoms on every text, but parses the
+    texts through nlp.pipe (across n_process worker processes when > 1).
+    Results are returned in input order.
+    """
+    return list(iter_extract_and_map_symptoms(texts, n_process=n_process, batch_size=batch_size))
+
+def _extract_chunk(texts, batch_size=64):
+    docs = nlp.pipe((t.lower() for t in texts), batch_size=batch_size)
+    return [_map_doc(doc, text) for doc, text in zip(docs, texts)]
+
+def iter_extract_and_map_symptoms(texts, n_process=1, batch_size=64, chunk_size=256):
+    """
+    Streaming form of extract_and_map_symptoms_batch: consumes `texts` lazily and yields
+    (symptoms, severity) in input order. With n_process > 1, chunks of texts are parsed
+    and matched entirely inside worker processes (nlp.pipe + matchers per Doc), so only
+    short strings cross process boundaries; at most 2 * n_process chunks are in flight.
+    """
+    texts = iter(texts)
+    if n_process <= 1:
+        for chunk in iter(lambda: list(itertools.islice(texts, chunk_size)), []):
+            yield from _extract_chunk(chunk, batch_size)
+        return
+
+    with multiprocessing.Pool(processes=n_process) as pool:
+        in_flight = deque()
+        for chunk in iter(lambda: list(itertools.islice(texts, chunk_size)), []):
+            in_flight.append(pool.apply_async(_extract_chunk, (chunk, batch_size)))
+            if len(in_flight) >= 2 * n_process:
+                yield from in_flight.popleft().get()
+        while in_flight:
+            yield from in_flight.popleft().get()
+
+def _map_doc(doc, user_input: str):
     extracted_symptoms = set()
 
     matches = matcher(doc)
@@ -154,45 +284,77 @@ def extract_and_map_symptoms(user_input: str):
     user_lemma_text = " ".join(user_lemmas)
     raw_text = user_input.lower()
 
-    for word, features in STRONG_KEYWORDS.items():
-        if word in user_lemma_text or word in raw_text:
-            extracted_symptoms.update(features)
-
-    for (word1, word2), feature in FLEXIBLE_MATCHES.items():
-        if (word1 in user_lemma_text or word1 in raw_text) and (word2 in user_lemma_text or word2 in raw_text):
-            extracted_symptoms.add(feature)
+    # Strong keywords, flexible pairs, exact condition names and both symptom spellings in one pass
+    dictionary_features, raw_hits = dictionary_matcher.match(raw_text, user_lemma_text)
+    extracted_symptoms.update(dictionary_features)
 
     clean_words = raw_text.replace('.', '').replace(',', '').split()
-    for condition, features in DIRECT_CONDITION_MAP.items():
-        if condition in raw_text:
-            extracted_symptoms.update(features)
-            continue
-        for word in clean_words:
-            if len(word) >= 4 and len(condition) >= 4:
-                if fuzz.ratio(condition, word) >= 85:
-                    extracted_symptoms.update(features)
-                    break
-
-    for valid_sym in VALID_SYMPTOMS:
-        clean_sym = valid_sym.replace("_", " ")
-        if clean_sym in raw_text or valid_sym in raw_text:
-            extracted_symptoms.add(valid_sym)
+    for condition in fuzzy_index.match_conditions(clean_words, skip=raw_hits):
+        extracted_symptoms.update(DIRECT_CONDITION_MAP[condition])
             
     # 🚀 DYNAMIC FUZZY MATCHING FOR CUSTOM DATASETS (Fixes typos like "legpains")
     if not extracted_symptoms:
-        clean_list = [v.replace("_", " ") for v in VALID_SYMPTOMS]
-        for word in clean_words:
-            if len(word) >= 5: 
-                best_match, score = process.extractOne(word, VALID_SYMPTOMS)
-                clean_match, clean_score = process.extractOne(word, clean_list)
-                
-                if score >= 85:
-                    extracted_symptoms.add(best_match)
-                elif clean_score >= 85:
-                    idx = clean_list.index(clean_match)
-                    extracted_symptoms.add(VALID_SYMPTOMS[idx])
+        extracted_symptoms.update(fuzzy_index.match_symptoms(clean_words))
 
     final_valid_symptoms = [sym for sym in extracted_symptoms if sym in VALID_SYMPTOMS]
-    detected_severity = extract_severity(user_input)
+    # Reuse the Doc already parsed for matching instead of running the pipeline a second time
+    detected_severity = _severity_from_doc(doc)
             
-    return final_valid_symptoms, detected_severity
\ No newline at end of file
+    return final_valid_symptoms, detected_severity
+
+
+# ==========================================
+# JSONL BATCH CLI
+# ==========================================
+# Re-run extraction over exported logs (one JSON object per line), e.g.
+#   python symptom_nlp.py --input diagnostic_logs.jsonl --output extracted.jsonl --n-process 8
+# Each output line is the input record plus "extracted_symptoms" and "detected_severity".
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stream JSONL records through symptom extraction.")
+    parser.add_argument("--build-artifact", action="store_true", help=f"(re)build {NLP_ARTIFACT_PATH} and exit")
+    parser.add_argument("--input", default="-", help="JSONL file to read ('-' for stdin)")
+    parser.add_argument("--output", help="JSONL file to write")
+    parser.add_argument("--field", default="symptoms", help="record field holding the complaint text")
+    parser.add_argument("--n-process", type=int, default=max(1, (os.cpu_count() or 1) - 1))
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    args = parser.parse_args()
+
+    if args.build_artifact:
+        # Compiled once at import above; just persist it
+        build_artifact(_artifact)
+        sys.exit(0)
+    if not args.output:
+        parser.error("--output is required")
+
+    pending = deque()
+
+    def _texts(lines):
+        for line_no, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                print(f"WARN: Skipping line {line_no}: {e}", file=sys.stderr)
+                continue
+            if not isinstance(record, dict):
+                print(f"WARN: Skipping line {line_no}: expected a JSON object, got {type(record).__name__}", file=sys.stderr)
+                continue
+            pending.append(record)
+            yield str(record.get(args.field) or "")
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    count = 0
+    with source, open(args.output, "w", encoding="utf-8") as out:
+        results = iter_extract_and_map_symptoms(_texts(source), n_process=args.n_process,
+                                                batch_size=args.batch_size, chunk_size=args.chunk_size)
+        for symptoms, severity in results:
+            record = pending.popleft()
+            record["extracted_symptoms"] = sorted(symptoms)
+            record["detected_severity"] = severity
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            count += 1
+    print(f"INFO: Extracted symptoms for {count} records -> {args.output}", file=sys.stderr)
@@ -0,0 +1,161 @@
+# text_matcher.py
+
+# One-pass multi-pattern matching for the symptom dictionaries.
+# extract_and_map_symptoms used to run a separate Python `in` scan for every
+# STRONG_KEYWORDS word, both words of every FLEXIBLE_MATCHES pair (against the lemma text
+# and the raw text), every DIRECT_CONDITION_MAP key and both spellings of every
+# VALID_SYMPTOMS entry. That is hundreds of scans per message, growing with the
+# vocabulary. All of those strings are compiled once into an Aho-Corasick automaton. Each
+# text is then walked once and the hit set is mapped to features through precomputed
+# tables. Matching stays plain substring semantics (no word boundaries), exactly like the
+# `in` checks it replaces.
+#
+# The walk itself runs in C via pyahocorasick when it is installed. The pure-Python
+# automaton below is kept as a fallback. It is only competitive on very short inputs,
+# because the `in` scans it replaces are C loops too (see benchmarks/check_matcher_parity.py).
+#
+# Self-check against naive substring search:  python text_matcher.py
+
+from collections import defaultdict, deque
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+class AhoCorasick:
+    def __init__(self, patterns, native=None):
+        """native=None uses pyahocorasick when available; False forces the pure-Python walk."""
+        self.patterns = list(dict.fromkeys(p for p in patterns if p))
+        self.native = (ahocorasick is not None) if native is None else bool(native and ahocorasick)
+        if self.native:
+            self._automaton = ahocorasick.Automaton()
+            for pid, pattern in enumerate(self.patterns):
+                self._automaton.add_word(pattern, pid)
+            if self.patterns:
+                self._automaton.make_automaton()
+            return
+
+        goto = [{}]
+        outputs = [set()]
+        for pid, pattern in enumerate(self.patterns):
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    outputs.append(set())
+                state = nxt
+            outputs[state].add(pid)
+
+        # BFS for failure links; each state's outputs absorb its failure state's outputs
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                outputs[nxt] |= outputs[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._outputs = [frozenset(o) for o in outputs]
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def find_all(self, text):
+        """Set of patterns that occur anywhere in text."""
+        patterns = self.patterns
+        if self.native:
+            if not patterns:
+                return set()
+            return {patterns[pid] for _, pid in self._automaton.iter(text)}
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        state = 0
+        hits = set()
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if outputs[state]:
+                hits |= outputs[state]
+        return {patterns[pid] for pid in hits}
+
+
+class SymptomDictionaryMatcher:
+    """Compiles the keyword / pair / condition / symptom tables of symptom_nlp into one automaton."""
+
+    def __init__(self, strong_keywords, flexible_matches, direct_condition_map, valid_symptoms, native=None):
+        self.strong_keywords = {word: tuple(features) for word, features in strong_keywords.items()}
+        self.direct_conditions = {cond: tuple(features) for cond, features in direct_condition_map.items()}
+
+        # Pair lookups keyed by first word, so only pairs whose first word was seen are checked
+        self.pairs_by_first = defaultdict(list)
+        for (word1, word2), feature in flexible_matches.items():
+            self.pairs_by_first[word1].append((word2, feature))
+
+        # Either spelling ("stomach_pain" / "stomach pain") maps back to the symptom
+        self.symptom_spellings = defaultdict(set)
+        for symptom in valid_symptoms:
+            self.symptom_spellings[symptom].add(symptom)
+            self.symptom_spellings[symptom.replace("_", " ")].add(symptom)
+
+        patterns = set(self.strong_keywords) | set(self.direct_conditions) | set(self.symptom_spellings)
+        for (word1, word2) in flexible_matches:
+            patterns.update((word1, word2))
+        self.automaton = AhoCorasick(sorted(patterns), native=native)
+
+    def match(self, raw_text, lemma_text):
+        """
+        Returns (features, raw_hits). features is the set the substring scans produced.
+        raw_hits is every pattern found in raw_text (callers reuse it for condition checks).
+        """
+        raw_hits = self.automaton.find_all(raw_text)
+        any_hits = raw_hits | self.automaton.find_all(lemma_text) if lemma_text else raw_hits
+
+        features = set()
+        for word in any_hits:
+            strong = self.strong_keywords.get(word)
+            if strong:
+                features.update(strong)
+            for word2, feature in self.pairs_by_first.get(word, ()):
+                if word2 in any_hits:
+                    features.add(feature)
+        for pattern in raw_hits:
+            condition = self.direct_conditions.get(pattern)
+            if condition:
+                features.update(condition)
+            symptoms = self.symptom_spellings.get(pattern)
+            if symptoms:
+                features.update(symptoms)
+        return features, raw_hits
+
+
+if __name__ == "__main__":
+    import random
+    import sys
+
+    rng = random.Random(0)
+    alphabet = "abcde _"
+    variants = [False] + ([True] if ahocorasick is not None else [])
+    failures = 0
+    for trial in range(2000):
+        patterns = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 5))) for _ in range(rng.randint(1, 30))]
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 60)))
+        expected = {p for p in patterns if p in text}
+        for native in variants:
+            got = AhoCorasick(patterns, native=native).find_all(text)
+            if got != expected:
+                failures += 1
+                print(f"MISMATCH native={native} patterns={patterns!r} text={text!r}: {sorted(got)} != {sorted(expected)}")
+    print(f"{2000 * len(variants) - failures}/{2000 * len(variants)} random cases match naive substring search "
+          f"({'pure-Python + pyahocorasick' if len(variants) == 2 else 'pure-Python only; pyahocorasick not installed'}).")
+    sys.exit(1 if failures else 0)
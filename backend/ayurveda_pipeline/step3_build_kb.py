@@ -1,4 +1,5 @@
 import json
+import os
 from collections import defaultdict
 from pathlib import Path
 
@@ -9,6 +10,14 @@ GENDERS = ["male", "female"]
 SEVERITIES = ["low", "medium", "high"]
 
 
+def write_json_atomic(path: str, data) -> None:
+    # Write next to the target and rename, so a watching API worker never reads a half-written KB
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
 def build_contraindications(constraints: dict) -> list[str]:
     out = []
     if not constraints.get("child_safe", True):
@@ -148,14 +157,10 @@ def run():
         "zero_evidence_examples": missing_combos[:50],
     }
 
-    with open("output/ayurveda_kb_structured.json", "w", encoding="utf-8") as f:
-        json.dump(structured, f, indent=2, ensure_ascii=False)
-    with open("output/ayurveda_kb_flat.json", "w", encoding="utf-8") as f:
-        json.dump(flat, f, indent=2, ensure_ascii=False)
-    with open("output/ayurveda_kb_final.json", "w", encoding="utf-8") as f:
-        json.dump(flat, f, indent=2, ensure_ascii=False)
-    with open("output/kb_quality_report.json", "w", encoding="utf-8") as f:
-        json.dump(quality, f, indent=2, ensure_ascii=False)
+    write_json_atomic("output/ayurveda_kb_structured.json", structured)
+    write_json_atomic("output/ayurveda_kb_flat.json", flat)
+    write_json_atomic("output/ayurveda_kb_final.json", flat)
+    write_json_atomic("output/kb_quality_report.json", quality)
 
     # Keep a stable source-of-truth artifact for manual curation.
     medicine_master = {
@@ -176,8 +181,7 @@ def run():
         ]
         for disease, details in master.items()
     }
-    with open("medicine_master.json", "w", encoding="utf-8") as f:
-        json.dump(medicine_master, f, indent=2, ensure_ascii=False)
+    write_json_atomic("medicine_master.json", medicine_master)
 
     print(f"Diseases covered: {quality['disease_count']}")
     print(f"Dataset records: {quality['total_records']}")
@@ -0,0 +1,110 @@
+# bench_predict_under_login.py
+
+# Measures /predict latency on its own and again while a burst of /login requests runs
+# against the same server, to check that bcrypt work no longer steals the request
+# threadpool from diagnoses. Standard library only.
+#
+#   uvicorn app.main:app --workers 1            (from backend/)
+#   python benchmarks/bench_predict_under_login.py --url http://127.0.0.1:8000 \
+#       --user bench_user --password bench_pass --register
+#
+# Compare the p99 lines of the two phases; 429s during the login burst are expected
+# once AUTH_MAX_PENDING is exceeded.
+
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+PREDICT_BODY = {
+    "text": "I have a terrible headache and high fever since yesterday",
+    "username": "bench_user",
+    "age_category": "adult",
+    "gender": "male",
+    "is_pregnant": False,
+    "severity": "medium",
+}
+
+
+def _post(url, body, timeout=30):
+    req = urllib.request.Request(url, data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, (time.perf_counter() - start) * 1000
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _report(label, latencies, statuses):
+    codes = {code: statuses.count(code) for code in sorted(set(statuses))}
+    print(f"{label:<22} n={len(latencies):<5} p50={_percentile(latencies, 50):8.1f}ms "
+          f"p95={_percentile(latencies, 95):8.1f}ms p99={_percentile(latencies, 99):8.1f}ms  status={codes}")
+
+
+def _predict_phase(base_url, requests, concurrency):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: _post(f"{base_url}/predict", PREDICT_BODY), range(requests)))
+    return [ms for _, ms in results], [code for code, _ in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/predict latency with and without concurrent /login load")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--user", default="bench_user")
+    parser.add_argument("--password", default="bench_pass")
+    parser.add_argument("--register", action="store_true", help="create the benchmark user first")
+    parser.add_argument("--predict-requests", type=int, default=200)
+    parser.add_argument("--predict-concurrency", type=int, default=8)
+    parser.add_argument("--login-concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    if args.register:
+        status, _ = _post(f"{args.url}/register", {
+            "name": args.user, "password": args.password, "age": 30, "gender": "male", "weight": 70, "height": 175,
+        })
+        print(f"register -> {status}")
+
+    # Warm the caches/model so the first phase is not penalised
+    _predict_phase(args.url, 10, 2)
+
+    latencies, statuses = _predict_phase(args.url, args.predict_requests, args.predict_concurrency)
+    _report("predict (idle)", latencies, statuses)
+
+    stop = threading.Event()
+    login_results = []
+    lock = threading.Lock()
+
+    def login_loop():
+        while not stop.is_set():
+            result = _post(f"{args.url}/login", {"name": args.user, "password": args.password})
+            with lock:
+                login_results.append(result)
+
+    threads = [threading.Thread(target=login_loop, daemon=True) for _ in range(args.login_concurrency)]
+    for t in threads:
+        t.start()
+    time.sleep(0.5)
+    latencies, statuses = _predict_phase(args.url, args.predict_requests, args.predict_concurrency)
+    stop.set()
+    for t in threads:
+        t.join(timeout=30)
+
+    _report("predict (login burst)", latencies, statuses)
+    _report("login", [ms for _, ms in login_results], [code for code, _ in login_results])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# bench_symptom_nlp.py
+
+# Symptom extraction cost, before vs after the single-parse trimmed pipeline.
+#   before: full en_core_web_sm (tok2vec, tagger, parser, attribute_ruler, lemmatizer, ner)
+#           parsing every complaint twice (matching + extract_severity)
+#   after : symptom_nlp.extract_and_map_symptoms (parser/NER excluded, one parse per call)
+# Also checks that both produce identical symptoms and severities on the corpus.
+# --scaling measures the multiprocess batch path (iter_extract_and_map_symptoms) at each
+# --n-process value instead: throughput, speed-up over one process, and parallel
+# efficiency (speed-up / processes), plus parity with the single-process results.
+#
+#   python benchmarks/bench_symptom_nlp.py --repeat 20                           (from backend/)
+#   python benchmarks/bench_symptom_nlp.py --scaling --n-process 1,2,4,8 --repeat 500
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+import spacy
+
+import symptom_nlp
+
+CORPUS = [
+    "I have a terrible headache and high fever since yesterday",
+    "mild stomach pain with nausea and vomiting after eating street food",
+    "itching all over with a skin rash that keeps spreading",
+    "cough, chest pain and I feel short of breath when climbing stairs",
+    "my skin and eyes look yellow and my urine is dark",
+    "slight fever, body ache and I am very tired all the time",
+    "severe joint pain and swelling in my knees every morning",
+    "I keep sneezing, runny nose and chills, maybe a cold",
+    "burning when I pee and I need to urinate frequently",
+    "blurry vision, dizziness and a stiff neck since this afternoon",
+    "lost weight recently, always thirsty and hungry, feel exhausted",
+    "unbearable chest pain spreading to my left arm with sweating",
+    "pimples and acne on my face that are getting worse",
+    "loose motion three times today with stomach cramps",
+    "my child has red spots over the body and a high temperature",
+    "heartburn and acidity after every meal, sometimes indigestion",
+    "headache behind the eyes, joint pain and rash, worried about dengue",
+    "feeling weak on one side of my body and can't see clearly",
+    "I think I have jaundice, yellow eyes and abdominal pain",
+    "little cough with phlegm and a sore throat for a week",
+]
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _run(label, fn, texts, token_count):
+    latencies = []
+    start = time.perf_counter()
+    for text in texts:
+        t0 = time.perf_counter()
+        fn(text)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {token_count / elapsed:10.0f} tokens/s   mean={statistics.mean(latencies):6.2f}ms "
+          f"p50={_percentile(latencies, 50):6.2f}ms p99={_percentile(latencies, 99):6.2f}ms")
+    return elapsed
+
+
+def scaling(texts, process_counts, batch_size, chunk_size):
+    print(f"multiprocess scaling over {len(texts)} texts on {os.cpu_count()} CPUs "
+          f"(batch_size={batch_size}, chunk_size={chunk_size}; pool start-up included)")
+    baseline_s = baseline = None
+    mismatches = 0
+    for n in process_counts:
+        start = time.perf_counter()
+        results = list(symptom_nlp.iter_extract_and_map_symptoms(texts, n_process=n, batch_size=batch_size, chunk_size=chunk_size))
+        elapsed = time.perf_counter() - start
+        results = [(sorted(symptoms), severity) for symptoms, severity in results]
+        if baseline is None:
+            baseline_s, baseline = elapsed, results
+        elif results != baseline:
+            mismatches += 1
+            print(f"  MISMATCH: n_process={n} differs from n_process={process_counts[0]}")
+        speed_up = baseline_s / elapsed
+        print(f"n_process={n:<3} {len(texts) / elapsed:10.0f} texts/s   {elapsed:7.2f}s   "
+              f"speed-up={speed_up:5.2f}x   efficiency={speed_up / n * process_counts[0]:6.1%}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="spaCy symptom extraction: full double parse vs trimmed single parse")
+    parser.add_argument("--repeat", type=int, default=20, help="passes over the complaint corpus")
+    parser.add_argument("--scaling", action="store_true", help="measure multiprocess batch scaling instead")
+    parser.add_argument("--n-process", default="1,2,4", help="comma-separated process counts for --scaling")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    args = parser.parse_args()
+
+    if args.scaling:
+        process_counts = [int(n) for n in args.n_process.split(",") if n.strip()]
+        sys.exit(1 if scaling(CORPUS * args.repeat, process_counts, args.batch_size, args.chunk_size) else 0)
+
+    full_nlp = spacy.load("en_core_web_sm")
+    print(f"full pipeline   : {', '.join(full_nlp.pipe_names)}")
+    print(f"trimmed pipeline: {', '.join(symptom_nlp.nlp.pipe_names)}")
+
+    def before(text):
+        doc = full_nlp(text.lower())
+        symptoms, _ = symptom_nlp._map_doc(doc, text)
+        return symptoms, symptom_nlp._severity_from_doc(full_nlp(text.lower()))
+
+    after = symptom_nlp.extract_and_map_symptoms
+
+    mismatches = [t for t in CORPUS if (sorted(before(t)[0]), before(t)[1]) != (sorted(after(t)[0]), after(t)[1])]
+    print(f"parity: {len(CORPUS) - len(mismatches)}/{len(CORPUS)} complaints identical")
+    for text in mismatches:
+        print(f"  MISMATCH: {text!r}: {before(text)} != {after(text)}")
+
+    texts = CORPUS * args.repeat
+    token_count = sum(len(symptom_nlp.nlp.make_doc(t)) for t in texts)
+    # Warm both pipelines before timing
+    for text in CORPUS:
+        before(text)
+        after(text)
+
+    t_before = _run("before (full pipeline, 2 parses)", before, texts, token_count)
+    t_after = _run("after (trimmed, 1 parse)", after, texts, token_count)
+    print(f"speed-up: {t_before / t_after:.2f}x over {len(texts)} calls")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# check_fuzzy_parity.py
+
+# Parity + timing check: fuzzy_index (rapidfuzz cdist) vs the original thefuzz loops
+# (process.extractOne per word against VALID_SYMPTOMS and clean_list, fuzz.ratio per
+# word x condition), on typo'd symptom/condition words and a long rambling complaint.
+# Needs thefuzz installed for the reference side. Exit code 1 on any difference.
+#
+#   python benchmarks/check_fuzzy_parity.py        (from backend/)
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from thefuzz import fuzz, process
+
+from fuzzy_index import FuzzySymptomIndex
+from symptom_nlp import DIRECT_CONDITION_MAP, VALID_SYMPTOMS
+
+
+def legacy_symptoms(words):
+    found = set()
+    clean_list = [v.replace("_", " ") for v in VALID_SYMPTOMS]
+    for word in words:
+        if len(word) >= 5:
+            best_match, score = process.extractOne(word, VALID_SYMPTOMS)
+            clean_match, clean_score = process.extractOne(word, clean_list)
+            if score >= 85:
+                found.add(best_match)
+            elif clean_score >= 85:
+                found.add(VALID_SYMPTOMS[clean_list.index(clean_match)])
+    return found
+
+
+def legacy_conditions(words):
+    found = set()
+    for condition in DIRECT_CONDITION_MAP:
+        for word in words:
+            if len(word) >= 4 and len(condition) >= 4 and fuzz.ratio(condition, word) >= 85:
+                found.add(condition)
+                break
+    return found
+
+
+def typo(word, rng):
+    if len(word) < 3:
+        return word
+    i = rng.randrange(len(word))
+    op = rng.choice(("drop", "swap", "dup", "sub"))
+    if op == "drop":
+        return word[:i] + word[i + 1:]
+    if op == "dup":
+        return word[:i] + word[i] + word[i:]
+    if op == "swap" and i < len(word) - 1:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + word[i + 1:]
+
+
+def main():
+    rng = random.Random(0)
+    vocabulary = [w for s in VALID_SYMPTOMS for w in s.replace("_", " ").split()] + list(VALID_SYMPTOMS)
+    vocabulary += [w for c in DIRECT_CONDITION_MAP for w in c.split()] + ["legpains", "headach", "diabetis", "jaundise"]
+    word_lists = [[typo(rng.choice(vocabulary), rng) for _ in range(rng.randint(1, 8))] for _ in range(300)]
+    # One long rambling complaint: the case that used to hit multi-second tail latency
+    word_lists.append([typo(rng.choice(vocabulary), rng) for _ in range(400)])
+
+    index = FuzzySymptomIndex(VALID_SYMPTOMS, DIRECT_CONDITION_MAP.keys(), threshold=85)
+    mismatches = 0
+    legacy_s = indexed_s = 0.0
+    for words in word_lists:
+        start = time.perf_counter()
+        expected = (legacy_symptoms(words), legacy_conditions(words))
+        legacy_s += time.perf_counter() - start
+        start = time.perf_counter()
+        got = (index.match_symptoms(words), index.match_conditions(words))
+        indexed_s += time.perf_counter() - start
+        if got != expected:
+            mismatches += 1
+            print(f"MISMATCH {words[:10]!r}...: {got} != {expected}")
+
+    print(f"thefuzz loops : {legacy_s * 1000:9.1f} ms total")
+    print(f"cdist index   : {indexed_s * 1000:9.1f} ms total")
+    print(f"parity: {len(word_lists) - mismatches}/{len(word_lists)} word lists identical")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
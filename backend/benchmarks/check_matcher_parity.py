@@ -0,0 +1,127 @@
+# check_matcher_parity.py
+
+# Parity check: the compiled Aho-Corasick dictionary matcher vs the original per-entry
+# substring scans of symptom_nlp, over texts generated from the dictionaries themselves
+# (every keyword, pair, condition and symptom spelling, alone and in random
+# combinations) plus the complaint corpus of bench_symptom_nlp. Timing is reported per
+# input length (generated fragments, real complaints, long rambling complaints) for the
+# legacy scans, the pure-Python automaton and, if installed, pyahocorasick. Only the
+# parity result decides the exit code (1 on any difference).
+#
+#   python benchmarks/check_matcher_parity.py        (from backend/)
+
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+import symptom_nlp
+from bench_symptom_nlp import CORPUS
+from symptom_nlp import DIRECT_CONDITION_MAP, FLEXIBLE_MATCHES, STRONG_KEYWORDS, VALID_SYMPTOMS
+from text_matcher import SymptomDictionaryMatcher, ahocorasick
+
+
+def legacy_dictionary_features(raw_text, user_lemma_text):
+    """The substring scans exactly as extract_and_map_symptoms ran them before compilation."""
+    extracted = set()
+    for word, features in STRONG_KEYWORDS.items():
+        if word in user_lemma_text or word in raw_text:
+            extracted.update(features)
+    for (word1, word2), feature in FLEXIBLE_MATCHES.items():
+        if (word1 in user_lemma_text or word1 in raw_text) and (word2 in user_lemma_text or word2 in raw_text):
+            extracted.add(feature)
+    for condition, features in DIRECT_CONDITION_MAP.items():
+        if condition in raw_text:
+            extracted.update(features)
+    for valid_sym in VALID_SYMPTOMS:
+        clean_sym = valid_sym.replace("_", " ")
+        if clean_sym in raw_text or valid_sym in raw_text:
+            extracted.add(valid_sym)
+    return extracted
+
+
+def generated_texts(seed=0, combos=500):
+    fragments = list(STRONG_KEYWORDS) + list(DIRECT_CONDITION_MAP)
+    fragments += [f"{w1} {w2}" for w1, w2 in FLEXIBLE_MATCHES] + [f"my {w2} is {w1}" for w1, w2 in FLEXIBLE_MATCHES]
+    fragments += list(VALID_SYMPTOMS) + [s.replace("_", " ") for s in VALID_SYMPTOMS]
+    texts = [f"i have {f}" for f in fragments]
+    rng = random.Random(seed)
+    for _ in range(combos):
+        texts.append(", ".join(rng.sample(fragments, k=min(len(fragments), rng.randint(2, 6)))))
+    return texts + [t.lower() for t in CORPUS]
+
+
+def lemma_text(raw_text):
+    doc = symptom_nlp.nlp(raw_text)
+    return " ".join(token.lemma_ for token in doc if not token.is_stop and token.is_alpha)
+
+
+def long_complaints(min_chars):
+    """Real complaints run together until each text is at least min_chars long."""
+    texts = []
+    for start in range(len(CORPUS)):
+        parts, size = [], 0
+        for text in itertools.cycle(CORPUS[start:] + CORPUS[:start]):
+            parts.append(text.lower())
+            size += len(text) + 2
+            if size >= min_chars:
+                break
+        texts.append(", ".join(parts))
+    return texts
+
+
+def _time_us(fn, pairs, rounds=5):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for raw, lemmas in pairs:
+            fn(raw, lemmas)
+        best = min(best, time.perf_counter() - start)
+    return best / len(pairs) * 1e6
+
+
+def main():
+    texts = generated_texts()
+    pairs = [(t, lemma_text(t)) for t in texts]
+    print(f"{len(symptom_nlp.dictionary_matcher.automaton)} patterns compiled; checking {len(pairs)} texts")
+
+    tables = (STRONG_KEYWORDS, FLEXIBLE_MATCHES, DIRECT_CONDITION_MAP, VALID_SYMPTOMS)
+    matchers = {"pure-Python automaton": SymptomDictionaryMatcher(*tables, native=False)}
+    if ahocorasick is not None:
+        matchers["pyahocorasick"] = SymptomDictionaryMatcher(*tables, native=True)
+    else:
+        print("pyahocorasick not installed: only the pure-Python automaton is checked")
+
+    suites = {
+        "generated fragments": pairs,
+        "complaint corpus": [(t.lower(), lemma_text(t.lower())) for t in CORPUS],
+        "long complaints (>=540 chars)": [(t, lemma_text(t)) for t in long_complaints(540)],
+        "long complaints (>=2000 chars)": [(t, lemma_text(t)) for t in long_complaints(2000)],
+    }
+
+    mismatches = 0
+    for label, matcher in matchers.items():
+        for suite in suites.values():
+            for raw, lemmas in suite:
+                expected = legacy_dictionary_features(raw, lemmas)
+                got, _ = matcher.match(raw, lemmas)
+                if got != expected:
+                    mismatches += 1
+                    print(f"MISMATCH [{label}] {raw[:60]!r}: missing={sorted(expected - got)} extra={sorted(got - expected)}")
+
+    print(f"{'us/text':<32}{'avg chars':>10}{'legacy scans':>14}" + "".join(f"{label:>24}" for label in matchers))
+    for name, suite in suites.items():
+        avg_chars = sum(len(raw) for raw, _ in suite) / len(suite)
+        row = f"{name:<32}{avg_chars:>10.0f}{_time_us(legacy_dictionary_features, suite):>14.1f}"
+        row += "".join(f"{_time_us(matcher.match, suite):>24.1f}" for matcher in matchers.values())
+        print(row)
+    total = sum(len(suite) for suite in suites.values()) * len(matchers)
+    print(f"parity: {total - mismatches}/{total} identical")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -134,4 +134,7 @@ print(f"Precision: {precision * 100:.2f}%")
 print(f"Recall:    {recall * 100:.2f}%")
 print(f"F1-Score:  {f1 * 100:.2f}%")
 print("=========================================\n")
-print("SUCCESS: Master Artifacts securely saved to the 'models/' folder.")
\ No newline at end of file
+print("SUCCESS: Master Artifacts securely saved to the 'models/' folder.")
+
+# symptoms_list.pkl is part of the NLP artifact fingerprint; symptom_nlp refuses a stale one
+print("NEXT: Rebuild the NLP artifact: python app/symptom_nlp.py --build-artifact")
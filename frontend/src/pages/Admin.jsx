@@ -1,13 +1,56 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { ShieldAlert, ListOrdered, Activity, LogOut, Package } from 'lucide-react';
+import { ShieldAlert, ListOrdered, Activity, LogOut, Package, Download } from 'lucide-react';
+
+const API_URL = "http://localhost:8000";
+
+const PAGE_SIZE = 100;
+
+// The admin listings are keyset-paginated: only one page is fetched at a time and
+// `next_cursor` is passed back as `after` when the admin asks for more. Full exports
+// go through the NDJSON /stream endpoints instead of paging through the table.
+async function fetchPage(path, key, filters, after) {
+  const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+  Object.entries(filters).forEach(([name, value]) => { if (value) params.set(name, value); });
+  if (after) params.set("after", after);
+  const res = await fetch(`${API_URL}${path}?${params}`);
+  if (!res.ok) throw new Error(`${path} failed with ${res.status}`);
+  const data = await res.json();
+  return { rows: data[key] || [], cursor: data.next_cursor || null };
+}
+
+function exportUrl(path, filters) {
+  const params = new URLSearchParams();
+  Object.entries(filters).forEach(([name, value]) => { if (value) params.set(name, value); });
+  const query = params.toString();
+  return `${API_URL}${path}/stream${query ? `?${query}` : ""}`;
+}
 
 export default function Admin() {
   const [activeTab, setActiveTab] = useState("orders");
   const [orders, setOrders] = useState([]);
   const [logs, setLogs] = useState([]);
+  const [cursors, setCursors] = useState({ orders: null, logs: null });
+  const [usernameFilter, setUsernameFilter] = useState("");
+  const [appliedUsername, setAppliedUsername] = useState("");
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const navigate = useNavigate();
+  const filters = { username: appliedUsername.trim() };
+
+  const loadMore = async () => {
+    const isOrders = activeTab === "orders";
+    setLoadingMore(true);
+    try {
+      const page = await fetchPage(isOrders ? "/admin/orders" : "/admin/logs", activeTab, filters, cursors[activeTab]);
+      (isOrders ? setOrders : setLogs)(prev => [...prev, ...page.rows]);
+      setCursors(prev => ({ ...prev, [activeTab]: page.cursor }));
+    } catch (err) {
+      console.error("Failed to fetch more admin data", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
   useEffect(() => {
     // In a real app, you'd check if the user is an Admin here. 
@@ -15,16 +58,14 @@ export default function Admin() {
     const fetchData = async () => {
       setLoading(true);
       try {
-        const [ordersRes, logsRes] = await Promise.all([
-          fetch("http://localhost:8000/admin/orders"),
-          fetch("http://localhost:8000/admin/logs")
+        const [orderPage, logPage] = await Promise.all([
+          fetchPage("/admin/orders", "orders", filters),
+          fetchPage("/admin/logs", "logs", filters)
         ]);
         
-        const ordersData = await ordersRes.json();
-        const logsData = await logsRes.json();
-        
-        setOrders(ordersData.orders || []);
-        setLogs(logsData.logs || []);
+        setOrders(orderPage.rows);
+        setLogs(logPage.rows);
+        setCursors({ orders: orderPage.cursor, logs: logPage.cursor });
       } catch (err) {
         console.error("Failed to fetch admin data", err);
       } finally {
@@ -32,7 +73,7 @@ export default function Admin() {
       }
     };
     fetchData();
-  }, []);
+  }, [appliedUsername]);
 
   return (
     <div className="flex h-screen bg-gray-100 font-sans">
@@ -68,13 +109,31 @@ export default function Admin() {
 
       {/* MAIN CONTENT */}
       <div className="flex-1 overflow-y-auto p-10 bg-slate-50">
-        <div className="mb-8">
-          <h2 className="text-3xl font-black text-slate-800">
-            {activeTab === "orders" ? "Sales & Orders Hub" : "AI Diagnostic Tracking"}
-          </h2>
-          <p className="text-slate-500 mt-1 font-medium">
-            {activeTab === "orders" ? "Monitor your pharmacy revenue and recent customer transactions." : "Audit trail of patient symptoms and AI model predictions."}
-          </p>
+        <div className="mb-8 flex items-end justify-between gap-6">
+          <div>
+            <h2 className="text-3xl font-black text-slate-800">
+              {activeTab === "orders" ? "Sales & Orders Hub" : "AI Diagnostic Tracking"}
+            </h2>
+            <p className="text-slate-500 mt-1 font-medium">
+              {activeTab === "orders" ? "Monitor your pharmacy revenue and recent customer transactions." : "Audit trail of patient symptoms and AI model predictions."}
+            </p>
+          </div>
+          <form onSubmit={(e) => { e.preventDefault(); setAppliedUsername(usernameFilter); }} className="flex items-center gap-2">
+            <input
+              value={usernameFilter}
+              onChange={(e) => setUsernameFilter(e.target.value)}
+              placeholder="Filter by username"
+              className="p-2 border border-slate-200 rounded-lg text-sm font-medium"
+            />
+            <button type="submit" className="p-2 px-4 bg-slate-800 text-white rounded-lg text-sm font-bold">Apply</button>
+            <a
+              href={exportUrl(activeTab === "orders" ? "/admin/orders" : "/admin/logs", filters)}
+              download={`${activeTab}.ndjson`}
+              className="flex items-center space-x-1 p-2 px-4 bg-emerald-500 text-white rounded-lg text-sm font-bold"
+            >
+              <Download className="w-4 h-4" /> <span>Export all</span>
+            </a>
+          </form>
         </div>
 
         {loading ? (
@@ -154,6 +213,18 @@ export default function Admin() {
               </table>
             )}
 
+            {cursors[activeTab] && (
+              <div className="p-4 border-t border-slate-100 flex justify-center">
+                <button
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                  className="p-2 px-6 bg-slate-100 hover:bg-slate-200 text-slate-700 rounded-lg text-sm font-bold disabled:opacity-50"
+                >
+                  {loadingMore ? "Loading..." : "Load more"}
+                </button>
+              </div>
+            )}
+
           </div>
         )}
       </div>
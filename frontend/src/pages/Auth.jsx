@@ -2,6 +2,39 @@ import React, { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { User, Lock, Activity, ArrowRight, Leaf } from 'lucide-react';
 
+const API_URL = "http://localhost:8000";
+const PROFILE_POLL_MS = 3000;
+const PROFILE_POLL_MAX_TRIES = 40;
+
+// The dosha profile is generated in the background after /register, so a fresh login can
+// still be "pending". Keep polling /profile/status with the session token (independent of
+// this page, which unmounts on navigation) and update the stored user once it resolves.
+function pollProfileStatus(username, token, tries = 0) {
+  if (tries >= PROFILE_POLL_MAX_TRIES) return;
+  setTimeout(async () => {
+    try {
+      const res = await fetch(`${API_URL}/profile/status/${encodeURIComponent(username)}`, {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+      if (res.status === 401 || res.status === 403) return;
+      if (res.ok) {
+        const data = await res.json();
+        if (data.profile_status !== "pending") {
+          const stored = JSON.parse(localStorage.getItem('currentUser') || "null");
+          if (!stored || stored.name !== username) return;
+          const updated = { ...stored, ayurvedic_profile: data.ayurvedic_profile, profile_status: data.profile_status };
+          localStorage.setItem('currentUser', JSON.stringify(updated));
+          window.dispatchEvent(new CustomEvent('currentUserUpdated', { detail: updated }));
+          return;
+        }
+      }
+    } catch (err) {
+      console.error("Profile status check failed", err);
+    }
+    pollProfileStatus(username, token, tries + 1);
+  }, PROFILE_POLL_MS);
+}
+
 export default function Auth() {
   const [isLogin, setIsLogin] = useState(true);
   
@@ -24,7 +57,7 @@ export default function Auth() {
     
     try {
       if (!isLogin) {
-        const response = await fetch("http://localhost:8000/register", {
+        const response = await fetch(`${API_URL}/register`, {
           method: "POST", 
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({
@@ -46,7 +79,7 @@ export default function Auth() {
         alert('Registration Successful! Please log in.');
         setIsLogin(true); 
       } else {
-        const response = await fetch("http://localhost:8000/login", {
+        const response = await fetch(`${API_URL}/login`, {
           method: "POST", 
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({ name: formData.name, password: formData.password }),
@@ -60,6 +93,8 @@ export default function Auth() {
         
         // Perfectly matches the Dashboard.jsx state requirement
         localStorage.setItem('currentUser', JSON.stringify(data.user));
+        localStorage.setItem('authToken', data.token);
+        if (data.user.profile_status === "pending") pollProfileStatus(data.user.name, data.token);
         navigate('/dashboard');
       }
     } catch (err) { 
@@ -26,6 +26,10 @@ export default function Dashboard() {
     if (storedUser) setUser(JSON.parse(storedUser));
     else navigate('/');
 
+    // Auth.jsx keeps polling a pending dosha profile and announces it once generated
+    const onUserUpdated = (e) => setUser(e.detail);
+    window.addEventListener('currentUserUpdated', onUserUpdated);
+
     const fetchMedicines = async () => {
       try {
         const response = await fetch("http://localhost:8000/medicines");
@@ -36,10 +40,12 @@ export default function Dashboard() {
       }
     };
     fetchMedicines();
+    return () => window.removeEventListener('currentUserUpdated', onUserUpdated);
   }, [navigate]);
 
   const handleLogout = () => {
     localStorage.removeItem('currentUser');
+    localStorage.removeItem('authToken');
     navigate('/');
   };
 